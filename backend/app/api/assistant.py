@@ -1,61 +1,69 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+import asyncio
+import json
+from typing import Any, AsyncIterator
+
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.api.auth import get_current_user
 from app.dependencies import get_db
-from app.models import User, AssistantChat
+from app.models import User, AssistantChat, AssistantJob
 from app.schemas import (
     AssistantChatCreate,
     AssistantChatOut,
+    AssistantChatSendDeltaOut,
     AssistantChatSendIn,
     AssistantChatSendOut,
     AssistantChatSummaryOut,
     AssistantChatUpdate,
+    AssistantJobOut,
+    AssistantMessageOut,
+    AssistantMessagePageOut,
+)
+from app.services.assistant_jobs import JOB_FINAL_STATUSES, JOB_POLL_INTERVAL_SECONDS, enqueue_message, get_job, job_result
+from app.services.assistant_service import (
+    CHAT_LIST_MAX_SIZE,
+    CHAT_LIST_SIZE,
+    CHAT_PAGE_MAX_SIZE,
+    CHAT_PAGE_SIZE,
+    create_chat,
+    delete_chat,
+    get_chat,
+    list_chat_messages,
+    list_chats,
+    send_message_async,
+    stream_message,
+    update_chat,
 )
-from app.services.assistant_service import create_chat, delete_chat, get_chat, list_chats, send_message, update_chat
 
 router = APIRouter(prefix="/assistant", tags=["assistant"])
 
 
-def _chat_to_out(chat: AssistantChat) -> AssistantChatOut:
+def _chat_to_out(db: Session, chat: AssistantChat) -> AssistantChatOut:
+    # Only the latest page of messages; older ones come from GET /chats/{id}/messages.
+    messages, has_more = list_chat_messages(db, chat.id, CHAT_PAGE_SIZE)
     return AssistantChatOut(
-        id=chat.id,
-        title=chat.title,
-        provider=chat.provider,
-        created_at=chat.created_at,
-        updated_at=chat.updated_at,
-        messages_count=len(chat.messages),
-        messages=[
-            {
-                "id": message.id,
-                "role": message.role,
-                "content": message.content,
-                "intent": message.intent,
-                "action_json": message.action_json,
-                "created_at": message.created_at,
-            }
-            for message in chat.messages
-        ],
+        **AssistantChatSummaryOut.model_validate(chat).model_dump(),
+        messages=[AssistantMessageOut.model_validate(message) for message in messages],
+        has_more_messages=has_more,
     )
 
 
 @router.get("/chats", response_model=list[AssistantChatSummaryOut])
 def get_chats(
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(CHAT_LIST_SIZE, ge=1, le=CHAT_LIST_MAX_SIZE),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    chats = list_chats(db, current_user)
-    return [
-        AssistantChatSummaryOut(
-            id=chat.id,
-            title=chat.title,
-            provider=chat.provider,
-            created_at=chat.created_at,
-            updated_at=chat.updated_at,
-            messages_count=len(chat.messages),
-        )
-        for chat in chats
-    ]
+    # The cursor for the next (older) page is returned in the X-Next-Cursor header.
+    chats, next_cursor = list_chats(db, current_user, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return chats
 
 
 @router.post("/chats", response_model=AssistantChatOut, status_code=201)
@@ -65,13 +73,7 @@ def create_new_chat(
     current_user: User = Depends(get_current_user),
 ):
     chat = create_chat(db, current_user, title=payload.title if payload else None)
-    chat = (
-        db.query(AssistantChat)
-        .options(joinedload(AssistantChat.messages))
-        .filter(AssistantChat.id == chat.id)
-        .first()
-    )
-    return _chat_to_out(chat)
+    return _chat_to_out(db, chat)
 
 
 @router.get("/chats/{chat_id}", response_model=AssistantChatOut)
@@ -81,34 +83,52 @@ def get_chat_detail(
     current_user: User = Depends(get_current_user),
 ):
     chat = get_chat(db, current_user, chat_id)
-    chat = (
-        db.query(AssistantChat)
-        .options(joinedload(AssistantChat.messages))
-        .filter(AssistantChat.id == chat.id)
-        .first()
+    return _chat_to_out(db, chat)
+
+
+@router.get("/chats/{chat_id}/messages", response_model=AssistantMessagePageOut)
+def get_chat_messages(
+    chat_id: str,
+    before: int | None = None,
+    limit: int = Query(CHAT_PAGE_SIZE, ge=1, le=CHAT_PAGE_MAX_SIZE),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    chat = get_chat(db, current_user, chat_id)
+    messages, has_more = list_chat_messages(db, chat.id, limit, before_id=before)
+    return AssistantMessagePageOut(messages=messages, has_more=has_more)
+
+
+def _send_delta_out(result: dict[str, Any]) -> AssistantChatSendDeltaOut:
+    return AssistantChatSendDeltaOut(
+        chat=AssistantChatSummaryOut.model_validate(result["chat"]),
+        user_message=AssistantMessageOut.model_validate(result["user_message"]),
+        assistant_message=AssistantMessageOut.model_validate(result["assistant_message"]),
+        answer=result["answer"],
+        intent=result.get("intent"),
+        action_json=result.get("action_json"),
+        provider=result.get("provider", "gemini"),
+        model=result.get("model", "gemini"),
     )
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    return _chat_to_out(chat)
 
 
-@router.post("/chats/{chat_id}/messages", response_model=AssistantChatSendOut)
-def post_chat_message(
+@router.post("/chats/{chat_id}/messages", response_model=AssistantChatSendOut | AssistantChatSendDeltaOut)
+async def post_chat_message(
     chat_id: str,
     payload: AssistantChatSendIn,
+    delta: bool = False,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    result = send_message(db, current_user, chat_id, payload.message)
-    chat = result["chat"]
-    chat = (
-        db.query(AssistantChat)
-        .options(joinedload(AssistantChat.messages))
-        .filter(AssistantChat.id == chat.id)
-        .first()
-    )
+    # delta=true returns only the two new messages and chat metadata for clients
+    # that already hold the history; the default keeps the full chat payload.
+    result = await send_message_async(db, current_user, chat_id, payload.message)
+    if delta:
+        return await run_in_threadpool(_send_delta_out, result)
+
+    chat_out = await run_in_threadpool(_chat_to_out, db, result["chat"])
     return AssistantChatSendOut(
-        chat=_chat_to_out(chat),
+        chat=chat_out,
         answer=result["answer"],
         intent=result.get("intent"),
         action_json=result.get("action_json"),
@@ -117,6 +137,139 @@ def post_chat_message(
     )
 
 
+def _sse_event(event: str, data: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _stream_event_payload(event: str, data: dict[str, Any]) -> dict[str, Any]:
+    if event == "start":
+        return {
+            "chat_id": data["chat"].id,
+            "user_message": AssistantMessageOut.model_validate(data["user_message"]).model_dump(mode="json"),
+        }
+    if event == "message":
+        return {
+            "chat_id": data["chat"].id,
+            "message": AssistantMessageOut.model_validate(data["assistant_message"]).model_dump(mode="json"),
+            "answer": data["answer"],
+            "intent": data.get("intent"),
+            "action_json": data.get("action_json"),
+            "provider": data.get("provider", "gemini"),
+            "model": data.get("model", "gemini"),
+        }
+    return data
+
+
+async def _sse_stream(first: tuple[str, dict[str, Any]], events: AsyncIterator[tuple[str, dict[str, Any]]]) -> AsyncIterator[str]:
+    event, data = first
+    yield _sse_event(event, _stream_event_payload(event, data))
+    async for event, data in events:
+        yield _sse_event(event, _stream_event_payload(event, data))
+    yield _sse_event("done", {})
+
+
+@router.post("/chats/{chat_id}/messages/stream")
+async def stream_chat_message(
+    chat_id: str,
+    payload: AssistantChatSendIn,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    events = stream_message(db, current_user, chat_id, payload.message)
+    # Pull the first event before responding so 403/404 still surface as HTTP errors.
+    first = await anext(events)
+    return StreamingResponse(
+        _sse_stream(first, events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _job_to_out(db: Session, job: AssistantJob) -> AssistantJobOut:
+    out = AssistantJobOut(
+        id=job.id,
+        chat_id=job.chat_id,
+        status=job.status,
+        attempts=job.attempts or 0,
+        error=job.error if job.status == "failed" else None,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        user_message=AssistantMessageOut.model_validate(job.user_message),
+    )
+    if job.status == "done":
+        chat = db.query(AssistantChat).filter(AssistantChat.id == job.chat_id).first()
+        out.chat = AssistantChatSummaryOut.model_validate(chat) if chat else None
+        if job.assistant_message is not None:
+            out.assistant_message = AssistantMessageOut.model_validate(job.assistant_message)
+        result = job_result(job)
+        out.answer = result.get("answer")
+        out.intent = result.get("intent")
+        out.action_json = result.get("action_json")
+        out.provider = result.get("provider")
+        out.model = result.get("model")
+    return out
+
+
+@router.post("/chats/{chat_id}/jobs", response_model=AssistantJobOut, status_code=202)
+def enqueue_chat_message(
+    chat_id: str,
+    payload: AssistantChatSendIn,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    # The reply is produced by the job workers; poll GET /jobs/{id} or follow /jobs/{id}/events.
+    job = enqueue_message(db, current_user, chat_id, payload.message)
+    return _job_to_out(db, job)
+
+
+@router.get("/jobs/{job_id}", response_model=AssistantJobOut)
+def get_job_status(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    job = get_job(db, current_user, job_id)
+    return _job_to_out(db, job)
+
+
+def _refresh_job_out(db: Session, job_id: str) -> AssistantJobOut | None:
+    db.expire_all()
+    job = db.query(AssistantJob).filter(AssistantJob.id == job_id).first()
+    out = _job_to_out(db, job) if job else None
+    # Release the connection between polls.
+    db.rollback()
+    return out
+
+
+async def _job_events(db: Session, job_id: str, first: AssistantJobOut) -> AsyncIterator[str]:
+    out = first
+    status = None
+    while out is not None:
+        if out.status != status:
+            status = out.status
+            yield _sse_event(status, out.model_dump(mode="json"))
+        if status in JOB_FINAL_STATUSES:
+            return
+        await asyncio.sleep(JOB_POLL_INTERVAL_SECONDS)
+        out = await run_in_threadpool(_refresh_job_out, db, job_id)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    job = await run_in_threadpool(get_job, db, current_user, job_id)
+    first = await run_in_threadpool(_job_to_out, db, job)
+    return StreamingResponse(
+        _job_events(db, job_id, first),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.patch("/chats/{chat_id}", response_model=AssistantChatOut)
 def rename_chat(
     chat_id: str,
@@ -125,15 +278,7 @@ def rename_chat(
     current_user: User = Depends(get_current_user),
 ):
     chat = update_chat(db, current_user, chat_id, title=payload.title)
-    chat = (
-        db.query(AssistantChat)
-        .options(joinedload(AssistantChat.messages))
-        .filter(AssistantChat.id == chat.id)
-        .first()
-    )
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    return _chat_to_out(chat)
+    return _chat_to_out(db, chat)
 
 
 @router.delete("/chats/{chat_id}", status_code=204)
@@ -1,34 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Cookie, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from typing import Optional
 
 from app.dependencies import get_db
 from app.models import User
-from app.core.security import verify_password, create_access_token, decode_access_token
+from app.core.security import verify_password_async, create_access_token, decode_access_token
+from app.core.user_cache import load_user, user_values
+from app.services.auth_sessions import (
+    REFRESH_TOKEN_EXPIRE_DAYS,
+    create_session,
+    revoke_family,
+    revoke_session,
+    rotate_session,
+    session_revoked,
+)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 COOKIE_NAME = "access_token"
+REFRESH_COOKIE_NAME = "refresh_token"
 
 
-@router.post("/login", status_code=200)
-def login(
-    response: Response,
-    form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
-):
-    user = db.query(User).filter(User.username == form_data.username).first()
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
-    if not user or not verify_password(form_data.password, user.password_hash):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid credentials"
-        )
-
-    # ✅ добавили role в токен
-    access_token = create_access_token({"user_id": user.id, "role": user.role})
 
+def _set_auth_cookies(response: Response, access_token: str, refresh_token: str) -> None:
     # ✅ cookie оставляем как бонус (может пригодиться позже)
     response.set_cookie(
         key=COOKIE_NAME,
@@ -39,29 +40,105 @@ def login(
         max_age=60 * 60 * 24 * 7,
         path="/"
     )
+    response.set_cookie(
+        key=REFRESH_COOKIE_NAME,
+        value=refresh_token,
+        httponly=True,
+        samesite="lax",
+        secure=False,
+        max_age=60 * 60 * 24 * REFRESH_TOKEN_EXPIRE_DAYS,
+        path="/auth"
+    )
+
+
+@router.post("/login", status_code=200)
+async def login(
+    response: Response,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(get_db)
+):
+    user = await run_in_threadpool(lambda: db.query(User).filter(User.username == form_data.username).first())
+
+    # bcrypt runs in the password pool; the event loop keeps serving other requests.
+    if not user or not await verify_password_async(form_data.password, user.password_hash):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials"
+        )
+
+    # ✅ добавили role в токен
+    refresh_token, session_id = await run_in_threadpool(create_session, db, user.id)
+    access_token = create_access_token({"user_id": user.id, "role": user.role, "sid": session_id})
+    _set_auth_cookies(response, access_token, refresh_token)
 
     # ✅ Nuxt берет access_token отсюда
-    return {"ok": True, "access_token": access_token}
+    return {"ok": True, "access_token": access_token, "refresh_token": refresh_token}
 
 
-@router.post("/logout", status_code=200)
-def logout(response: Response):
-    response.delete_cookie(key=COOKIE_NAME, path="/")
-    return {"ok": True}
+# Renews the access token with an indexed session lookup instead of a password check.
+@router.post("/refresh", status_code=200)
+def refresh(
+    response: Response,
+    data: Optional[RefreshRequest] = None,
+    refresh_token: Optional[str] = Cookie(None),
+    db: Session = Depends(get_db)
+):
+    token = data.refresh_token if data else refresh_token
+    rotated = rotate_session(db, token) if token else None
+    if rotated is None:
+        # Returned rather than raised: headers set on `response` are dropped with an exception.
+        rejected = JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Invalid refresh token"})
+        rejected.delete_cookie(key=REFRESH_COOKIE_NAME, path="/auth")
+        return rejected
 
+    user, new_refresh_token, session_id = rotated
+    access_token = create_access_token({"user_id": user.id, "role": user.role, "sid": session_id})
+    _set_auth_cookies(response, access_token, new_refresh_token)
+    return {"ok": True, "access_token": access_token, "refresh_token": new_refresh_token}
 
-def get_current_user(
+
+@router.post("/logout", status_code=200)
+def logout(
+    response: Response,
+    data: Optional[RefreshRequest] = None,
+    refresh_token: Optional[str] = Cookie(None),
     access_token: Optional[str] = Cookie(None),
     authorization: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    token = None
+    token = data.refresh_token if data else refresh_token
+    if token:
+        revoke_session(db, token)
+    # Ends this device's session only. Its access tokens are rejected at once on this
+    # worker and within SESSION_CHECK_TTL_SECONDS on the others.
+    payload = decode_access_token(_request_token(access_token, authorization) or "")
+    if payload and payload.get("sid"):
+        revoke_family(db, payload["sid"])
+    response.delete_cookie(key=COOKIE_NAME, path="/")
+    response.delete_cookie(key=REFRESH_COOKIE_NAME, path="/auth")
+    return {"ok": True}
+
 
+# Identity and role of the caller, read from the per-worker user cache (a SELECT on a
+# miss, none while warm). Endpoints that only need these take it instead of a User
+# and skip attaching a User to the request session.
+class Principal:
+    __slots__ = ("id", "role")
+
+    def __init__(self, id: int, role: str):
+        self.id = id
+        self.role = role
+
+
+def _request_token(access_token: Optional[str], authorization: Optional[str]) -> Optional[str]:
     # ✅ приоритет Bearer (как у тебя и было)
     if authorization and authorization.lower().startswith("bearer "):
-        token = authorization.split(" ", 1)[1]
-    else:
-        token = access_token
+        return authorization.split(" ", 1)[1]
+    return access_token
+
+
+def _token_payload(access_token: Optional[str], authorization: Optional[str]) -> dict:
+    token = _request_token(access_token, authorization)
 
     if not token:
         raise HTTPException(
@@ -75,12 +152,51 @@ def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token"
         )
+    return payload
 
-    user = db.query(User).filter(User.id == payload["user_id"]).first()
-    if not user:
+
+def _check_not_revoked(db: Session, payload: dict) -> None:
+    if payload.get("sid") and session_revoked(db, payload["sid"]):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token revoked"
         )
 
-    return user
\ No newline at end of file
+
+def _user_not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="User not found"
+    )
+
+
+def _load_user(db: Session, user_id: int) -> User:
+    user = load_user(db, user_id)
+    if not user:
+        raise _user_not_found()
+    return user
+
+
+def get_current_user(
+    access_token: Optional[str] = Cookie(None),
+    authorization: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    payload = _token_payload(access_token, authorization)
+    _check_not_revoked(db, payload)
+    return _load_user(db, payload["user_id"])
+
+
+def get_current_principal(
+    access_token: Optional[str] = Cookie(None),
+    authorization: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+) -> Principal:
+    payload = _token_payload(access_token, authorization)
+    # The role comes from the user row (via the TTL cache), not from the token, so a
+    # demotion or deletion reaches every worker within USER_CACHE_TTL_SECONDS.
+    values = user_values(db, payload["user_id"])
+    if values is None:
+        raise _user_not_found()
+    _check_not_revoked(db, payload)
+    return Principal(values["id"], values["role"])
\ No newline at end of file
@@ -5,11 +5,12 @@ import shutil
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.orm import Session, joinedload
 
-from app.api.auth import get_current_user
+from app.api.auth import Principal, get_current_user
 from app.api.deps import require_roles
 from app.models import User, Car, CarImage
 from app.dependencies import get_db
 from app.schemas import CarCreate, CarUpdate, CarOut, CarImageOut
+from app.services.assistant_context import invalidate_user_context
 
 router = APIRouter(prefix="/cars", tags=["cars"])
 
@@ -33,7 +34,7 @@ def get_my_cars(
 @router.get("/admin/all", response_model=list[CarOut])
 def admin_get_all_cars(
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin"))
+    _: Principal = Depends(require_roles("admin"))
 ):
     return (
         db.query(Car)
@@ -47,7 +48,7 @@ def admin_get_all_cars(
 def admin_get_car(
     car_id: int,
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin"))
+    _: Principal = Depends(require_roles("admin"))
 ):
     car = (
         db.query(Car)
@@ -97,6 +98,7 @@ def create_car(
     )
     db.add(car)
     db.commit()
+    invalidate_user_context(current_user.id)
     db.refresh(car)
     return car
 
@@ -120,6 +122,7 @@ def update_car(
         setattr(car, field, value)
 
     db.commit()
+    invalidate_user_context(current_user.id)
     db.refresh(car)
     return car
 
@@ -140,6 +143,7 @@ def delete_car(
 
     db.delete(car)
     db.commit()
+    invalidate_user_context(current_user.id)
 
 
 @router.post("/{car_id}/images", response_model=list[CarImageOut], status_code=201)
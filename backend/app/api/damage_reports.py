@@ -6,7 +6,7 @@ from datetime import datetime
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
 from sqlalchemy.orm import Session, joinedload
 
-from app.api.auth import get_current_user
+from app.api.auth import Principal, get_current_user
 from app.api.deps import require_roles
 from app.dependencies import get_db
 from app.models import (
@@ -20,6 +20,7 @@ from app.models import (
     User,
 )
 from app.schemas import DamageReportAnalyze, DamageReportCreate, DamageReportOut
+from app.services.assistant_context import invalidate_user_context
 
 router = APIRouter(prefix="/damage-reports", tags=["damage-reports"])
 
@@ -77,6 +78,7 @@ def create_damage_report(
 
     db.add(report)
     db.commit()
+    invalidate_user_context(current_user.id)
 
     created = _query_report_with_relations(db).filter(DamageReport.id == report.id).first()
     return created
@@ -98,7 +100,7 @@ def get_my_damage_reports(
 @router.get("/mechanic/queue", response_model=list[DamageReportOut])
 def get_damage_reports_queue(
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("mechanic", "admin", "dev")),
+    _: Principal = Depends(require_roles("mechanic", "admin", "dev")),
 ):
     return (
         _query_report_with_relations(db)
@@ -169,7 +171,7 @@ def analyze_damage_report(
     report_id: int,
     data: DamageReportAnalyze,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_roles("mechanic", "admin", "dev")),
+    current_user: Principal = Depends(require_roles("mechanic", "admin", "dev")),
 ):
     report = db.query(DamageReport).filter(DamageReport.id == report_id).first()
     if not report:
@@ -274,6 +276,7 @@ def analyze_damage_report(
         )
 
     db.commit()
+    invalidate_user_context(report.requested_by)
 
     updated = _query_report_with_relations(db).filter(DamageReport.id == report.id).first()
     return updated
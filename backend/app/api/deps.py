@@ -1,9 +1,8 @@
 from fastapi import Depends, HTTPException, status
-from app.api.auth import get_current_user
-from app.models import User
+from app.api.auth import Principal, get_current_principal
 
 def require_roles(*roles: str):
-    def _dep(user: User = Depends(get_current_user)):
+    def _dep(user: Principal = Depends(get_current_principal)):
         if user.role not in roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
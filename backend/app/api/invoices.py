@@ -2,11 +2,12 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session, joinedload
 from datetime import datetime
 
-from app.api.auth import get_current_user
+from app.api.auth import Principal, get_current_user
 from app.api.deps import require_roles
 from app.dependencies import get_db
 from app.models import Invoice, InvoiceItem, ServiceOrder, User
 from app.schemas import InvoiceAdminUpdate, InvoiceOut
+from app.services.assistant_context import invalidate_user_context
 
 router = APIRouter(prefix="/invoices", tags=["invoices"])
 
@@ -30,7 +31,7 @@ def get_my_invoices(
 @router.get("/admin/all", response_model=list[InvoiceOut])
 def get_all_invoices_admin(
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin", "dev")),
+    _: Principal = Depends(require_roles("admin", "dev")),
 ):
     return (
         db.query(Invoice)
@@ -44,7 +45,7 @@ def get_all_invoices_admin(
 def get_invoice_admin(
     invoice_id: int,
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin", "dev")),
+    _: Principal = Depends(require_roles("admin", "dev")),
 ):
     invoice = (
         db.query(Invoice)
@@ -62,7 +63,7 @@ def update_invoice_admin(
     invoice_id: int,
     data: InvoiceAdminUpdate,
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin", "dev")),
+    _: Principal = Depends(require_roles("admin", "dev")),
 ):
     invoice = (
         db.query(Invoice)
@@ -103,6 +104,7 @@ def update_invoice_admin(
         invoice.status = data.status
 
     db.commit()
+    invalidate_user_context(invoice.order.requested_by if invoice.order else None)
     db.refresh(invoice)
     return invoice
 
@@ -111,7 +113,7 @@ def update_invoice_admin(
 def send_invoice_to_user(
     invoice_id: int,
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin", "dev")),
+    _: Principal = Depends(require_roles("admin", "dev")),
 ):
     invoice = db.query(Invoice).options(joinedload(Invoice.items), joinedload(Invoice.order)).filter(Invoice.id == invoice_id).first()
     if not invoice:
@@ -126,6 +128,7 @@ def send_invoice_to_user(
 
     invoice.status = "sent"
     db.commit()
+    invalidate_user_context(invoice.order.requested_by if invoice.order else None)
     db.refresh(invoice)
     return invoice
 
@@ -182,5 +185,6 @@ def mark_invoice_paid(
     invoice.paid_at = datetime.utcnow()
 
     db.commit()
+    invalidate_user_context(invoice.order.requested_by if invoice.order else None)
     db.refresh(invoice)
     return invoice
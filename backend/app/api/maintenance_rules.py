@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session, joinedload
 from fastapi import APIRouter, Depends, HTTPException, status
 from datetime import datetime, timedelta
 
-from app.api.auth import get_current_user
+from app.api.auth import Principal, get_current_user
 from app.api.deps import require_roles
 from app.dependencies import get_db
 from app.core.i18n import normalize_i18n_map
@@ -18,6 +18,7 @@ from app.schemas import (
     ServiceExecutionCreate,
     ServiceExecutionOut,
 )
+from app.services.assistant_context import invalidate_shared_context, invalidate_user_context
 
 router = APIRouter(prefix="/maintenance-rules", tags=["maintenance-rules"])
 OVERDUE_DAYS = 180
@@ -64,7 +65,7 @@ def get_active_rules(db: Session = Depends(get_db)):
 @router.get("/admin/all", response_model=list[MaintenanceRuleOut])
 def get_all_rules_admin(
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin"))
+    _: Principal = Depends(require_roles("admin"))
 ):
     rules = (
         db.query(MaintenanceRule)
@@ -113,7 +114,7 @@ def get_rule(rule_id: int, db: Session = Depends(get_db)):
 def create_rule(
     data: MaintenanceRuleCreate,
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin"))
+    _: Principal = Depends(require_roles("admin"))
 ):
     rule = MaintenanceRule(
         title=data.title,
@@ -144,6 +145,7 @@ def create_rule(
 
     db.add(rule)
     db.commit()
+    invalidate_shared_context()
     db.refresh(rule)
     return rule
 
@@ -170,7 +172,9 @@ def create_rule_execution(
     rule_id: int,
     data: ServiceExecutionCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_roles("mechanic", "admin"))
+    _: Principal = Depends(require_roles("mechanic", "admin")),
+    # performed_by_name needs the username, which the token claims do not carry.
+    current_user: User = Depends(get_current_user)
 ):
     rule = db.query(MaintenanceRule).filter(MaintenanceRule.id == rule_id).first()
     if not rule:
@@ -222,6 +226,7 @@ def create_rule_execution(
         db.add(service_book_entry)
 
     db.commit()
+    invalidate_user_context(car.owner_id if car is not None else None)
     db.refresh(execution)
     return execution
 
@@ -259,7 +264,7 @@ def update_rule(
     rule_id: int,
     data: MaintenanceRuleUpdate,
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin"))
+    _: Principal = Depends(require_roles("admin"))
 ):
     rule = db.query(MaintenanceRule).filter(MaintenanceRule.id == rule_id).first()
     if not rule:
@@ -306,6 +311,7 @@ def update_rule(
             rule.tasks.append(task)
 
     db.commit()
+    invalidate_shared_context()
     db.refresh(rule)
     return rule
 
@@ -314,7 +320,7 @@ def update_rule(
 def delete_rule(
     rule_id: int,
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin"))
+    _: Principal = Depends(require_roles("admin"))
 ):
     rule = db.query(MaintenanceRule).filter(MaintenanceRule.id == rule_id).first()
     if not rule:
@@ -322,6 +328,7 @@ def delete_rule(
 
     db.delete(rule)
     db.commit()
+    invalidate_shared_context()
 
 
 # Task management endpoints
@@ -330,7 +337,7 @@ def add_task_to_rule(
     rule_id: int,
     task_data: MaintenanceTaskCreate,
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin"))
+    _: Principal = Depends(require_roles("admin"))
 ):
     rule = db.query(MaintenanceRule).filter(MaintenanceRule.id == rule_id).first()
     if not rule:
@@ -352,6 +359,7 @@ def add_task_to_rule(
 
     db.add(task)
     db.commit()
+    invalidate_shared_context()
     db.refresh(task)
     return task
 
@@ -361,7 +369,7 @@ def remove_task_from_rule(
     rule_id: int,
     task_id: int,
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin"))
+    _: Principal = Depends(require_roles("admin"))
 ):
     task = db.query(MaintenanceRuleTask).filter(
         MaintenanceRuleTask.id == task_id,
@@ -372,6 +380,7 @@ def remove_task_from_rule(
 
     db.delete(task)
     db.commit()
+    invalidate_shared_context()
     return {"message": "Task deleted"}
 
 
@@ -381,7 +390,7 @@ def update_task_in_rule(
     task_id: int,
     task_data: MaintenanceTaskCreate,
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin"))
+    _: Principal = Depends(require_roles("admin"))
 ):
     task = db.query(MaintenanceRuleTask).filter(
         MaintenanceRuleTask.id == task_id,
@@ -398,6 +407,7 @@ def update_task_in_rule(
         task.description_i18n = normalize_i18n_map(task_data.description_i18n, task.description)
 
     db.commit()
+    invalidate_shared_context()
     db.refresh(task)
     return task
 
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends
+
+from app.api.auth import Principal
+from app.api.deps import require_roles
+from app.core import metrics
+from app.services.llm_limits import llm_limiter
+from app.services.model_health import model_health
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+def _routing_summary(counters: dict[str, int]) -> dict[str, float | int]:
+    prefix = "assistant.routing."
+    routes = {name[len(prefix):]: value for name, value in counters.items() if name.startswith(prefix)}
+    total = sum(routes.values())
+    return {
+        "turns": total,
+        "llm_share": round(routes.get("llm", 0) / total, 3) if total else 0.0,
+        "skipped_llm_share": round(1 - routes.get("llm", 0) / total, 3) if total else 0.0,
+        "rules_share": round(routes.get("rules", 0) / total, 3) if total else 0.0,
+    }
+
+
+@router.get("/")
+def get_metrics(_: Principal = Depends(require_roles("admin", "dev"))):
+    snapshot = metrics.snapshot()
+    return {
+        **snapshot,
+        "routing": _routing_summary(snapshot["counters"]),
+        "model_health": model_health.snapshot(),
+        "llm_limits": llm_limiter.snapshot(),
+    }
@@ -8,8 +8,9 @@ import json
 from app.dependencies import get_db
 from app.models import ServiceBookEntry, ServiceOrder, Car, User
 from app.schemas import ServiceBookCreate, ServiceBookOut, ServiceInspectionCreate
-from app.api.auth import get_current_user
+from app.api.auth import Principal, get_current_user
 from app.api.deps import require_roles
+from app.services.assistant_context import invalidate_user_context
 
 router = APIRouter(prefix="/service-book", tags=["service-book"])
 
@@ -34,7 +35,7 @@ def _extract_part(label: str, text: str) -> str | None:
 @router.get("/admin/all", response_model=list[ServiceBookOut])
 def get_all_entries_admin(
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin"))
+    _: Principal = Depends(require_roles("admin"))
 ):
     return db.query(ServiceBookEntry).order_by(
         ServiceBookEntry.created_at.desc()
@@ -44,7 +45,7 @@ def get_all_entries_admin(
 @router.get("/admin/inspection", response_model=list[ServiceBookOut])
 def get_all_inspections_admin(
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin"))
+    _: Principal = Depends(require_roles("admin"))
 ):
     return (
         db.query(ServiceBookEntry)
@@ -59,7 +60,7 @@ def get_all_inspections_admin(
 def get_entry_admin(
     entry_id: int,
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin"))
+    _: Principal = Depends(require_roles("admin"))
 ):
     entry = (
         db.query(ServiceBookEntry)
@@ -76,7 +77,7 @@ def get_entry_admin(
 def create_inspection_admin(
     data: ServiceInspectionCreate,
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin"))
+    _: Principal = Depends(require_roles("admin"))
 ):
     car = db.query(Car).filter(Car.id == data.car_id).first()
     if not car:
@@ -99,6 +100,7 @@ def create_inspection_admin(
 
     db.add(entry)
     db.commit()
+    invalidate_user_context(car.owner_id)
     db.refresh(entry)
     return entry
 
@@ -108,7 +110,7 @@ def update_inspection_admin(
     entry_id: int,
     data: ServiceInspectionCreate,
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin"))
+    _: Principal = Depends(require_roles("admin"))
 ):
     entry = db.query(ServiceBookEntry).filter(ServiceBookEntry.id == entry_id).first()
     if not entry:
@@ -125,6 +127,7 @@ def update_inspection_admin(
         "comment": data.comment or "",
     }
 
+    previous_owner_id = entry.car.owner_id if entry.car else None
     entry.car_id = car.id
     entry.type = "technical_inspection"
     entry.mileage = data.mileage if data.mileage is not None else int(car.mileage or 0)
@@ -132,6 +135,7 @@ def update_inspection_admin(
     entry.order_number = data.order_number
 
     db.commit()
+    invalidate_user_context(previous_owner_id, car.owner_id)
     db.refresh(entry)
     return entry
 
@@ -139,7 +143,7 @@ def update_inspection_admin(
 def get_car_entries_admin(
     car_id: int,
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("admin"))
+    _: Principal = Depends(require_roles("admin"))
 ):
     car = db.query(Car).filter(Car.id == car_id).first()
     if not car:
@@ -214,6 +218,7 @@ def create_entry(
 
     db.add(entry)
     db.commit()
+    invalidate_user_context(current_user.id)
     db.refresh(entry)
 
     if data.type == "booking":
@@ -239,6 +244,7 @@ def create_entry(
         )
         db.add(order)
         db.commit()
+        invalidate_user_context(current_user.id)
 
     return entry
 
@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException, Header
 from sqlalchemy import or_
 from sqlalchemy.orm import Session, joinedload
 
-from app.api.auth import get_current_user
+from app.api.auth import Principal, get_current_user
 from app.api.deps import require_roles
 from app.core.i18n import normalize_i18n_map, normalize_lang
 from app.dependencies import get_db
@@ -25,6 +25,7 @@ from app.schemas import (
     ServiceOrderCreate,
     ServiceOrderDetailsOut,
 )
+from app.services.assistant_context import invalidate_user_context
 
 router = APIRouter(prefix="/service-orders", tags=["service-orders"])
 
@@ -164,6 +165,7 @@ def create_service_order(
 
     db.add(order)
     db.commit()
+    invalidate_user_context(current_user.id)
 
     order = (
         db.query(ServiceOrder)
@@ -199,7 +201,7 @@ def get_my_orders(
 @router.get("/mechanic/queue", response_model=list[ServiceOrderDetailsOut])
 def get_mechanic_queue(
     db: Session = Depends(get_db),
-    _: User = Depends(require_roles("mechanic", "admin", "dev")),
+    _: Principal = Depends(require_roles("mechanic", "admin", "dev")),
 ):
     return (
         db.query(ServiceOrder)
@@ -277,7 +279,7 @@ def accept_order(
     order_id: int,
     _: ServiceOrderAccept,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_roles("mechanic", "admin", "dev")),
+    current_user: Principal = Depends(require_roles("mechanic", "admin", "dev")),
 ):
     order = db.query(ServiceOrder).filter(ServiceOrder.id == order_id).first()
     if not order:
@@ -294,6 +296,7 @@ def accept_order(
     order.status = "accepted"
 
     db.commit()
+    invalidate_user_context(order.requested_by)
 
     return (
         db.query(ServiceOrder)
@@ -312,7 +315,7 @@ def complete_order(
     order_id: int,
     data: ServiceOrderComplete,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_roles("mechanic", "admin", "dev")),
+    current_user: Principal = Depends(require_roles("mechanic", "admin", "dev")),
 ):
     order = (
         db.query(ServiceOrder)
@@ -464,6 +467,7 @@ def complete_order(
     invoice.total = subtotal
 
     db.commit()
+    invalidate_user_context(order.requested_by)
 
     result = db.query(Invoice).options(joinedload(Invoice.items)).filter(Invoice.id == invoice.id).first()
     return result
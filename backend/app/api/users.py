@@ -5,9 +5,12 @@ from pydantic import BaseModel
 from app.dependencies import get_db
 from app.models import User
 from app.schemas import UserCreate, UserUpdate, UserOut
-from app.core.security import hash_password, encrypt_secret
-from app.api.auth import get_current_user
+from app.core.security import hash_password, encrypt_secret, forget_user_secret
+from app.core.user_cache import invalidate_user
+from app.api.auth import Principal, get_current_user
 from app.api.deps import require_roles
+from app.services.assistant_context import invalidate_user_context
+from app.services.auth_sessions import revoke_user_sessions
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -31,7 +34,7 @@ def _mask_api_key(api_key: str) -> str:
 @router.get("/", response_model=list[UserOut])
 def get_users(
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_roles("admin", "dev"))
+    current_user: Principal = Depends(require_roles("admin", "dev"))
 ):
     return db.query(User).all()
 
@@ -64,6 +67,8 @@ def save_my_ai_key(
 
     db.add(current_user)
     db.commit()
+    invalidate_user(current_user.id)
+    forget_user_secret(current_user.id)
     db.refresh(current_user)
 
     return UserAiKeyStatus(has_key=True, masked_key=current_user.ai_api_key_masked)
@@ -78,6 +83,8 @@ def delete_my_ai_key(
     current_user.ai_api_key_masked = None
     db.add(current_user)
     db.commit()
+    invalidate_user(current_user.id)
+    forget_user_secret(current_user.id)
 
     return None
 
@@ -137,11 +144,15 @@ def update_user(
     if not is_admin and 'role' in update_data:
         update_data.pop('role')
 
-    if 'password' in update_data:
+    password_changed = 'password' in update_data
+    if password_changed:
         update_data['password_hash'] = hash_password(update_data.pop('password'))
     for field, value in update_data.items():
         setattr(user, field, value)
     db.commit()
+    invalidate_user(user_id)
+    if password_changed:
+        revoke_user_sessions(db, user_id)
     db.refresh(user)
     return user
 
@@ -161,4 +172,7 @@ def delete_user(
 
     db.delete(user)
     db.commit()
+    invalidate_user_context(user_id)
+    invalidate_user(user_id)
+    forget_user_secret(user_id)
     return None
\ No newline at end of file
@@ -0,0 +1,77 @@
+import os
+import threading
+from collections import deque
+from typing import Any
+
+# In-process metrics for the worker; latency percentiles cover the most recent samples.
+METRICS_WINDOW_SIZE = int(os.getenv("METRICS_WINDOW_SIZE", "2048"))
+
+_lock = threading.Lock()
+_counters: dict[str, int] = {}
+_gauges: dict[str, float] = {}
+_samples: dict[str, deque] = {}
+_sample_counts: dict[str, int] = {}
+
+
+def increment(name: str, value: int = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name: str, value: float) -> None:
+    with _lock:
+        _gauges[name] = value
+
+
+def add_to_gauge(name: str, delta: float) -> float:
+    with _lock:
+        value = _gauges.get(name, 0) + delta
+        _gauges[name] = value
+        return value
+
+
+def observe(name: str, seconds: float) -> None:
+    with _lock:
+        window = _samples.get(name)
+        if window is None:
+            window = deque(maxlen=METRICS_WINDOW_SIZE)
+            _samples[name] = window
+        window.append(seconds)
+        _sample_counts[name] = _sample_counts.get(name, 0) + 1
+
+
+def _percentile(sorted_values: list[float], quantile: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, int(round(quantile * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def _summarize(values: list[float], total: int) -> dict[str, Any]:
+    ordered = sorted(values)
+    return {
+        "count": total,
+        "window": len(ordered),
+        "p50_ms": round(_percentile(ordered, 0.50) * 1000, 1),
+        "p95_ms": round(_percentile(ordered, 0.95) * 1000, 1),
+        "p99_ms": round(_percentile(ordered, 0.99) * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+
+def snapshot() -> dict[str, Any]:
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        samples = {name: (list(window), _sample_counts.get(name, 0)) for name, window in _samples.items() if window}
+    return {
+        "counters": counters,
+        "gauges": gauges,
+        "latencies": {name: _summarize(values, total) for name, (values, total) in samples.items()},
+    }
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _samples.clear()
+        _sample_counts.clear()
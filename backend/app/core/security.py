@@ -1,39 +1,184 @@
+import asyncio
 import os
 import base64
 import hashlib
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
+from fastapi.concurrency import run_in_threadpool
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from cryptography.fernet import Fernet, InvalidToken
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+
+from app.core import metrics
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "change-me-in-env")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
+# bcrypt runs in a small process pool so hashing does not hold the GIL of the API
+# worker. Calls beyond PASSWORD_POOL_MAX_PENDING are refused instead of queued.
+# PASSWORD_POOL_WORKERS=0 hashes inline (async callers use the request threadpool).
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", "64"))
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+_password_pool: ProcessPoolExecutor | None = None
+_password_pool_lock = threading.Lock()
+_password_pool_pending = 0
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
 # Хэширование пароля
-def hash_password(password: str) -> str:
+def _hash_password_inline(password: str) -> str:
     if len(password.encode('utf-8')) > 72:
         password_bytes = password.encode('utf-8')[:72]
         password = password_bytes.decode('utf-8', 'ignore')
     return pwd_context.hash(password)
 
 # Проверка пароля
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+def _verify_password_inline(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+
+def _get_password_pool() -> ProcessPoolExecutor:
+    global _password_pool
+    with _password_pool_lock:
+        if _password_pool is None:
+            # spawn: children must not inherit the API process's threads and sockets.
+            _password_pool = ProcessPoolExecutor(
+                max_workers=PASSWORD_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _password_pool
+
+
+def _discard_password_pool(pool: ProcessPoolExecutor) -> None:
+    global _password_pool
+    with _password_pool_lock:
+        if _password_pool is not pool:
+            return
+        _password_pool = None
+    metrics.increment("auth.password_pool.rebuilt")
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _pool_submit(fn, *args) -> Future:
+    # A worker killed by OOM or a signal breaks the whole executor; replace it.
+    pool = _get_password_pool()
+    try:
+        return pool.submit(fn, *args)
+    except BrokenProcessPool:
+        _discard_password_pool(pool)
+        return _get_password_pool().submit(fn, *args)
+
+
+def _submit_password_job(fn, *args) -> Future:
+    global _password_pool_pending
+    with _password_pool_lock:
+        if _password_pool_pending >= PASSWORD_POOL_MAX_PENDING:
+            metrics.increment("auth.password_pool.rejected")
+            raise PasswordPoolBusy()
+        _password_pool_pending += 1
+        depth = _password_pool_pending
+    metrics.set_gauge("auth.password_pool.queue_depth", depth)
+    started = time.perf_counter()
+
+    def _done(_: Future) -> None:
+        global _password_pool_pending
+        with _password_pool_lock:
+            _password_pool_pending -= 1
+            depth = _password_pool_pending
+        metrics.set_gauge("auth.password_pool.queue_depth", depth)
+        metrics.observe("auth.password_pool.latency", time.perf_counter() - started)
+
+    try:
+        future = _pool_submit(fn, *args)
+    except BaseException:
+        _done(None)
+        raise
+    future.add_done_callback(_done)
+    return future
+
+
+def _run_password_job(fn, *args):
+    try:
+        return _submit_password_job(fn, *args).result()
+    except BrokenProcessPool:
+        # The job died with its worker; the retry's submit rebuilds the pool.
+        return _submit_password_job(fn, *args).result()
+
+
+async def _run_password_job_async(fn, *args):
+    try:
+        return await asyncio.wrap_future(_submit_password_job(fn, *args))
+    except BrokenProcessPool:
+        return await asyncio.wrap_future(_submit_password_job(fn, *args))
+
+
+def hash_password(password: str) -> str:
+    if PASSWORD_POOL_WORKERS <= 0:
+        return _hash_password_inline(password)
+    return _run_password_job(_hash_password_inline, password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    if PASSWORD_POOL_WORKERS <= 0:
+        return _verify_password_inline(plain_password, hashed_password)
+    return _run_password_job(_verify_password_inline, plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    if PASSWORD_POOL_WORKERS <= 0:
+        return await run_in_threadpool(_hash_password_inline, password)
+    return await _run_password_job_async(_hash_password_inline, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    if PASSWORD_POOL_WORKERS <= 0:
+        return await run_in_threadpool(_verify_password_inline, plain_password, hashed_password)
+    return await _run_password_job_async(_verify_password_inline, plain_password, hashed_password)
+
+
+def shutdown_password_pool() -> None:
+    global _password_pool
+    with _password_pool_lock:
+        pool, _password_pool = _password_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
 # Создание JWT
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-# Декодирование JWT
-def decode_access_token(token: str):
+# Payloads of already verified access tokens, per worker, keyed by a digest of the
+# token and dropped at the token's exp. Revocation (logout) is checked after decoding,
+# against the token's session (app.services.auth_sessions).
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+
+_verified_tokens: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+
+def _token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _verify_access_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: int = payload.get("user_id")
@@ -44,14 +189,55 @@ def decode_access_token(token: str):
         return None
 
 
-def _build_ai_key_cipher() -> Fernet:
-    # Keep deterministic encryption key per deployment.
-    # Explicit AI_KEY_ENCRYPTION_KEY has priority.
-    source = os.getenv("AI_KEY_ENCRYPTION_KEY") or f"fallback::{SECRET_KEY}"
+# Декодирование JWT
+def decode_access_token(token: str):
+    if TOKEN_CACHE_SIZE <= 0:
+        return _verify_access_token(token)
+
+    digest = _token_digest(token)
+    now = time.time()
+    with _token_cache_lock:
+        entry = _verified_tokens.get(digest)
+        if entry is not None:
+            if entry[0] > now:
+                _verified_tokens.move_to_end(digest)
+                metrics.increment("auth.token_cache.hits")
+                return dict(entry[1])
+            del _verified_tokens[digest]
+
+    metrics.increment("auth.token_cache.misses")
+    payload = _verify_access_token(token)
+    if payload is not None and isinstance(payload.get("exp"), (int, float)):
+        with _token_cache_lock:
+            _verified_tokens[digest] = (float(payload["exp"]), dict(payload))
+            while len(_verified_tokens) > TOKEN_CACHE_SIZE:
+                _verified_tokens.popitem(last=False)
+    return payload
+
+
+# Decrypted AI keys, per worker, keyed by user id and a hash of the ciphertext.
+AI_KEY_CACHE_TTL_SECONDS = float(os.getenv("AI_KEY_CACHE_TTL_SECONDS", "300"))
+AI_KEY_CACHE_SIZE = int(os.getenv("AI_KEY_CACHE_SIZE", "1024"))
+
+_ai_key_cache: "OrderedDict[int, tuple[str, float, Optional[str]]]" = OrderedDict()
+_ai_key_cache_lock = threading.Lock()
+
+
+def _fernet_for(source: str) -> Fernet:
     key = base64.urlsafe_b64encode(hashlib.sha256(source.encode("utf-8")).digest())
     return Fernet(key)
 
 
+@lru_cache(maxsize=1)
+def _build_ai_key_cipher() -> MultiFernet:
+    # Keep deterministic encryption key per deployment.
+    # Explicit AI_KEY_ENCRYPTION_KEY has priority. Keys listed (comma-separated) in
+    # AI_KEY_ENCRYPTION_PREVIOUS_KEYS still decrypt, so the main key can be rotated.
+    source = os.getenv("AI_KEY_ENCRYPTION_KEY") or f"fallback::{SECRET_KEY}"
+    previous = [item.strip() for item in os.getenv("AI_KEY_ENCRYPTION_PREVIOUS_KEYS", "").split(",") if item.strip()]
+    return MultiFernet([_fernet_for(source)] + [_fernet_for(item) for item in previous])
+
+
 def encrypt_secret(secret: str) -> str:
     cipher = _build_ai_key_cipher()
     return cipher.encrypt(secret.encode("utf-8")).decode("utf-8")
@@ -63,3 +249,26 @@ def decrypt_secret(secret_encrypted: str) -> Optional[str]:
         return cipher.decrypt(secret_encrypted.encode("utf-8")).decode("utf-8")
     except (InvalidToken, ValueError):
         return None
+
+
+def decrypt_user_secret(user_id: int, secret_encrypted: str) -> Optional[str]:
+    digest = hashlib.sha256(secret_encrypted.encode("utf-8")).hexdigest()
+    now = time.monotonic()
+    with _ai_key_cache_lock:
+        entry = _ai_key_cache.get(user_id)
+        if entry is not None and entry[0] == digest and now - entry[1] < AI_KEY_CACHE_TTL_SECONDS:
+            _ai_key_cache.move_to_end(user_id)
+            return entry[2]
+
+    secret = decrypt_secret(secret_encrypted)
+    with _ai_key_cache_lock:
+        _ai_key_cache[user_id] = (digest, now, secret)
+        _ai_key_cache.move_to_end(user_id)
+        while len(_ai_key_cache) > AI_KEY_CACHE_SIZE:
+            _ai_key_cache.popitem(last=False)
+    return secret
+
+
+def forget_user_secret(user_id: int) -> None:
+    with _ai_key_cache_lock:
+        _ai_key_cache.pop(user_id, None)
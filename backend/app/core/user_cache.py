@@ -0,0 +1,67 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.core import metrics
+from app.models import User
+
+# Column values of recently authenticated users, per worker. Writes in users.py drop
+# the entry; the TTL bounds staleness from writes handled by other workers, which
+# includes role changes and deletions seen by role checks.
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "4096"))
+
+_users: "OrderedDict[int, tuple[float, dict[str, Any]]]" = OrderedDict()
+_lock = threading.Lock()
+
+_USER_COLUMNS = tuple(column.key for column in User.__table__.columns)
+
+
+def _attach(db: Session, values: dict[str, Any]) -> User:
+    # merge(load=False) puts a copy into this session without a SELECT, so callers
+    # get a regular persistent User they can read, update and commit.
+    user = User(**values)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def user_values(db: Session, user_id: int) -> dict[str, Any] | None:
+    # Column values only; callers must not modify the returned dict.
+    now = time.monotonic()
+    with _lock:
+        entry = _users.get(user_id)
+        if entry is not None and now - entry[0] < USER_CACHE_TTL_SECONDS:
+            _users.move_to_end(user_id)
+            values = entry[1]
+        else:
+            values = None
+
+    if values is not None:
+        metrics.increment("auth.user_cache.hits")
+        return values
+
+    metrics.increment("auth.user_cache.misses")
+    user = db.query(User).filter(User.id == user_id).first()
+    if user is None:
+        return None
+    values = {key: getattr(user, key) for key in _USER_COLUMNS}
+    with _lock:
+        _users[user_id] = (now, values)
+        _users.move_to_end(user_id)
+        while len(_users) > USER_CACHE_SIZE:
+            _users.popitem(last=False)
+    return values
+
+
+def load_user(db: Session, user_id: int) -> User | None:
+    values = user_values(db, user_id)
+    return _attach(db, values) if values is not None else None
+
+
+def invalidate_user(user_id: int) -> None:
+    with _lock:
+        _users.pop(user_id, None)
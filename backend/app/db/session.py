@@ -5,6 +5,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+from app.db.sql_logging import SQL_ECHO, install_sql_logging
+
 DB_USER = os.getenv("DB_USER", "postgres")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "postgres_password")
 DB_HOST = os.getenv("DB_HOST", "localhost")
@@ -16,10 +18,11 @@ DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NA
 # Keep pool connections healthy after DB/container restarts.
 engine = create_engine(
     DATABASE_URL,
-    echo=True,
+    echo=SQL_ECHO,
     pool_pre_ping=True,
     pool_recycle=1800,
 )
+install_sql_logging(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -98,6 +101,74 @@ def init_database():
             ADD COLUMN IF NOT EXISTS completion_comment_i18n JSONB
         """))
 
+        conn.execute(text("""
+            ALTER TABLE IF EXISTS assistant_chats
+            ADD COLUMN IF NOT EXISTS summary TEXT
+        """))
+
+        conn.execute(text("""
+            ALTER TABLE IF EXISTS assistant_chats
+            ADD COLUMN IF NOT EXISTS summary_message_id INTEGER
+        """))
+
+        conn.execute(text("""
+            ALTER TABLE IF EXISTS assistant_chats
+            ADD COLUMN IF NOT EXISTS messages_count INTEGER NOT NULL DEFAULT 0
+        """))
+
+        conn.execute(text("""
+            ALTER TABLE IF EXISTS assistant_chats
+            ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP
+        """))
+
+        conn.execute(text("""
+            ALTER TABLE IF EXISTS assistant_chats
+            ADD COLUMN IF NOT EXISTS last_message_preview VARCHAR(200)
+        """))
+
+        # Backfill counters for chats that had messages before the columns existed.
+        conn.execute(text("""
+            UPDATE assistant_chats AS chats
+            SET messages_count = stats.messages_count,
+                last_message_at = stats.last_message_at,
+                last_message_preview = LEFT(stats.last_message_content, 200)
+            FROM (
+                SELECT DISTINCT ON (chat_id)
+                    chat_id,
+                    COUNT(*) OVER (PARTITION BY chat_id) AS messages_count,
+                    created_at AS last_message_at,
+                    content AS last_message_content
+                FROM assistant_messages
+                ORDER BY chat_id, created_at DESC, id DESC
+            ) AS stats
+            WHERE chats.id = stats.chat_id AND chats.last_message_at IS NULL
+        """))
+
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_assistant_chats_user_id_updated_at
+            ON assistant_chats (user_id, updated_at, id)
+        """))
+
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_assistant_messages_chat_id_created_at
+            ON assistant_messages (chat_id, created_at, id)
+        """))
+
+        conn.execute(text("""
+            ALTER TABLE IF EXISTS assistant_messages
+            ADD COLUMN IF NOT EXISTS reply_to_id INTEGER REFERENCES assistant_messages (id) ON DELETE SET NULL
+        """))
+
+        conn.execute(text("""
+            ALTER TABLE IF EXISTS assistant_messages
+            ADD COLUMN IF NOT EXISTS model VARCHAR
+        """))
+
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_assistant_messages_reply_to_id
+            ON assistant_messages (reply_to_id)
+        """))
+
         conn.execute(text("""
             UPDATE maintenance_rules
             SET title_i18n = jsonb_build_object('ru', title)
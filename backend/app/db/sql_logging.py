@@ -0,0 +1,150 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core import metrics
+
+# SQL observability without per-statement stdout writes. SQL_ECHO restores SQLAlchemy's
+# echo for local debugging. A SQL_LOG_SAMPLE_RATE share of statements goes to the
+# "app.sql.statements" logger, statements slower than SQL_SLOW_QUERY_MS to "app.sql.slow".
+# Both loggers only enqueue; a listener thread formats and writes the JSON lines.
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() in {"1", "true", "yes"}
+SQL_LOG_SAMPLE_RATE = float(os.getenv("SQL_LOG_SAMPLE_RATE", "0"))
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+SQL_LOG_PARAMS = os.getenv("SQL_LOG_PARAMS", "true").lower() in {"1", "true", "yes"}
+SQL_LOG_MAX_LENGTH = int(os.getenv("SQL_LOG_MAX_LENGTH", "2000"))
+
+_SECRET_PARAM_MARKERS = ("password", "token", "api_key", "secret")
+
+# "METHOD /path" of the request being served; set by SqlRouteMiddleware.
+current_route: ContextVar[str | None] = ContextVar("current_route", default=None)
+
+statement_logger = logging.getLogger("app.sql.statements")
+slow_query_logger = logging.getLogger("app.sql.slow")
+
+_listener: QueueListener | None = None
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"ts": round(record.created, 3), "logger": record.name, **getattr(record, "sql", {})}
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SqlRouteMiddleware:
+    # Plain ASGI: tags the request without wrapping its body or streamed response.
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_route.set(f"{scope['method']} {scope['path']}")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_route.reset(token)
+
+
+def _truncate(value: str) -> str:
+    return value if len(value) <= SQL_LOG_MAX_LENGTH else value[:SQL_LOG_MAX_LENGTH] + "..."
+
+
+def _redact(parameters):
+    if isinstance(parameters, dict):
+        return {
+            key: "***" if any(marker in str(key).lower() for marker in _SECRET_PARAM_MARKERS) else value
+            for key, value in parameters.items()
+        }
+    if isinstance(parameters, (list, tuple)) and parameters and isinstance(parameters[0], dict):
+        return [_redact(item) for item in parameters]
+    return parameters
+
+
+def _named(parameters, context):
+    # Positional drivers (e.g. sqlite) get their bind names back so secrets can be redacted.
+    names = getattr(getattr(context, "compiled", None), "positiontup", None)
+    if names and isinstance(parameters, (list, tuple)) and len(names) == len(parameters):
+        return dict(zip(names, parameters))
+    return parameters
+
+
+def _entry(statement: str, parameters, context, duration: float, executemany: bool) -> dict:
+    entry = {
+        "route": current_route.get() or "-",
+        "duration_ms": round(duration * 1000, 2),
+        "statement": _truncate(" ".join(statement.split())),
+    }
+    if executemany:
+        entry["executemany"] = True
+    if SQL_LOG_PARAMS:
+        entry["parameters"] = _truncate(repr(_redact(_named(parameters, context))))
+    return entry
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("sql_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("sql_started_at")
+    if not started:
+        return
+    duration = time.perf_counter() - started.pop()
+    metrics.observe("db.statement", duration)
+
+    if SQL_SLOW_QUERY_MS > 0 and duration * 1000 >= SQL_SLOW_QUERY_MS:
+        metrics.increment("db.slow_statements")
+        slow_query_logger.warning("slow query", extra={"sql": _entry(statement, parameters, context, duration, executemany)})
+    elif SQL_LOG_SAMPLE_RATE > 0 and random.random() < SQL_LOG_SAMPLE_RATE:
+        statement_logger.info("statement", extra={"sql": _entry(statement, parameters, context, duration, executemany)})
+
+
+def _handle_error(exception_context):
+    # Failed statements never reach after_cursor_execute; drop their start time.
+    started = exception_context.connection.info.get("sql_started_at") if exception_context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def _start_listener() -> None:
+    global _listener
+    if _listener is not None:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream = logging.StreamHandler()
+    stream.setFormatter(_JsonFormatter())
+    for logger, level in ((statement_logger, logging.INFO), (slow_query_logger, logging.WARNING)):
+        logger.addHandler(QueueHandler(log_queue))
+        logger.setLevel(level)
+        logger.propagate = False
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_sql_logging)
+
+
+def stop_sql_logging() -> None:
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def install_sql_logging(engine: Engine) -> None:
+    if SQL_SLOW_QUERY_MS <= 0 and SQL_LOG_SAMPLE_RATE <= 0:
+        return
+    _start_listener()
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
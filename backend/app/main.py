@@ -1,14 +1,34 @@
 import os
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy import text
 
-from app.api import users, auth, cars, service_book, maintenance_rules, service_orders, invoices, damage_reports, assistant
+from app.api import users, auth, cars, service_book, maintenance_rules, service_orders, invoices, damage_reports, assistant, metrics
+from app.core.security import PasswordPoolBusy, shutdown_password_pool
 from app.db.base import Base
 from app.db.session import engine
+from app.db.sql_logging import SqlRouteMiddleware, stop_sql_logging
+from app.services.assistant_jobs import start_job_workers, stop_job_workers
+from app.services.gemini_client import close_gemini_clients
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_job_workers()
+    try:
+        yield
+    finally:
+        stop_job_workers()
+        shutdown_password_pool()
+        stop_sql_logging()
+        await close_gemini_clients()
+
 
-app = FastAPI(title="CAR API")
+app = FastAPI(title="CAR API", lifespan=lifespan)
 
 origins = [
     "http://localhost:3000",
@@ -21,7 +41,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+# Slow-query log entries name the request that ran them.
+app.add_middleware(SqlRouteMiddleware)
+
 
 os.makedirs("uploads/cars", exist_ok=True)
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
@@ -35,6 +59,13 @@ app.include_router(service_orders.router)
 app.include_router(invoices.router)
 app.include_router(damage_reports.router)
 app.include_router(assistant.router)
+app.include_router(metrics.router)
+
+
+@app.exception_handler(PasswordPoolBusy)
+async def password_pool_busy(request: Request, exc: PasswordPoolBusy):
+    return JSONResponse(status_code=503, content={"detail": "Server is busy, try again shortly"}, headers={"Retry-After": "1"})
+
 
 Base.metadata.create_all(bind=engine)
 
@@ -10,6 +10,8 @@ from app.models.invoice import Invoice, InvoiceItem
 from app.models.damage_report import DamageReport, DamageReportImage
 from app.models.assistant_chat import AssistantChat
 from app.models.assistant_message import AssistantMessage
+from app.models.assistant_job import AssistantJob
+from app.models.auth_session import AuthSession
 
 __all__ = [
     "Base",
@@ -27,4 +29,6 @@ __all__ = [
     "DamageReportImage",
     "AssistantChat",
     "AssistantMessage",
+    "AssistantJob",
+    "AuthSession",
 ]
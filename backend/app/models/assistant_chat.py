@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -7,11 +7,17 @@ from app.db.base import Base
 
 class AssistantChat(Base):
     __tablename__ = "assistant_chats"
+    __table_args__ = (Index("ix_assistant_chats_user_id_updated_at", "user_id", "updated_at", "id"),)
 
     id = Column(String(36), primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     title = Column(String, nullable=False, default="Новый чат")
     provider = Column(String, nullable=False, default="gemini")
+    summary = Column(Text, nullable=True)
+    summary_message_id = Column(Integer, nullable=True)
+    messages_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_at = Column(DateTime, nullable=True)
+    last_message_preview = Column(String(200), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
@@ -20,5 +26,6 @@ class AssistantChat(Base):
         "AssistantMessage",
         back_populates="chat",
         cascade="all, delete-orphan",
+        passive_deletes=True,
         order_by="AssistantMessage.created_at.asc()",
     )
@@ -0,0 +1,35 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text, text
+from sqlalchemy.orm import relationship
+
+from app.db.base import Base
+
+
+class AssistantJob(Base):
+    __tablename__ = "assistant_jobs"
+    __table_args__ = (
+        Index("ix_assistant_jobs_status_created_at", "status", "created_at"),
+        # One unanswered message per chat keeps turns in order.
+        Index(
+            "uq_assistant_jobs_active_chat",
+            "chat_id",
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    id = Column(String(36), primary_key=True, index=True)
+    chat_id = Column(String(36), ForeignKey("assistant_chats.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_message_id = Column(Integer, ForeignKey("assistant_messages.id", ondelete="CASCADE"), nullable=False)
+    assistant_message_id = Column(Integer, ForeignKey("assistant_messages.id", ondelete="SET NULL"), nullable=True)
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    result_json = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    user_message = relationship("AssistantMessage", foreign_keys=[user_message_id])
+    assistant_message = relationship("AssistantMessage", foreign_keys=[assistant_message_id])
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -7,6 +7,7 @@ from app.db.base import Base
 
 class AssistantMessage(Base):
     __tablename__ = "assistant_messages"
+    __table_args__ = (Index("ix_assistant_messages_chat_id_created_at", "chat_id", "created_at", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     chat_id = Column(String(36), ForeignKey("assistant_chats.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -14,6 +15,9 @@ class AssistantMessage(Base):
     content = Column(Text, nullable=False)
     intent = Column(String, nullable=True)
     action_json = Column(Text, nullable=True)
+    # Assistant replies point at the user message they answer and record who wrote them.
+    reply_to_id = Column(Integer, ForeignKey("assistant_messages.id", ondelete="SET NULL"), nullable=True, index=True)
+    model = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     chat = relationship("AssistantChat", back_populates="messages")
@@ -46,9 +46,12 @@ from app.schemas.assistant_chat import (
     AssistantChatSendIn,
     AssistantChatUpdate,
     AssistantMessageOut,
+    AssistantMessagePageOut,
     AssistantChatSummaryOut,
     AssistantChatOut,
     AssistantChatSendOut,
+    AssistantChatSendDeltaOut,
+    AssistantJobOut,
 )
 
 __all__ = [
@@ -97,7 +100,10 @@ __all__ = [
     "AssistantChatSendIn",
     "AssistantChatUpdate",
     "AssistantMessageOut",
+    "AssistantMessagePageOut",
     "AssistantChatSummaryOut",
     "AssistantChatOut",
     "AssistantChatSendOut",
+    "AssistantChatSendDeltaOut",
+    "AssistantJobOut",
 ]
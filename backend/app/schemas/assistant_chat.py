@@ -39,12 +39,20 @@ class AssistantChatSummaryOut(BaseModel):
     created_at: datetime
     updated_at: datetime
     messages_count: int = 0
+    last_message_at: Optional[datetime] = None
+    last_message_preview: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
 
 
 class AssistantChatOut(AssistantChatSummaryOut):
     messages: list[AssistantMessageOut] = Field(default_factory=list)
+    has_more_messages: bool = False
+
+
+class AssistantMessagePageOut(BaseModel):
+    messages: list[AssistantMessageOut] = Field(default_factory=list)
+    has_more: bool = False
 
 
 class AssistantChatSendOut(BaseModel):
@@ -54,3 +62,33 @@ class AssistantChatSendOut(BaseModel):
     action_json: Optional[str] = None
     provider: str = "gemini"
     model: str = "gemini"
+
+
+class AssistantChatSendDeltaOut(BaseModel):
+    chat: AssistantChatSummaryOut
+    user_message: AssistantMessageOut
+    assistant_message: AssistantMessageOut
+    answer: str
+    intent: Optional[str] = None
+    action_json: Optional[str] = None
+    provider: str = "gemini"
+    model: str = "gemini"
+
+
+class AssistantJobOut(BaseModel):
+    id: str
+    chat_id: str
+    status: str
+    attempts: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    user_message: AssistantMessageOut
+    assistant_message: Optional[AssistantMessageOut] = None
+    chat: Optional[AssistantChatSummaryOut] = None
+    answer: Optional[str] = None
+    intent: Optional[str] = None
+    action_json: Optional[str] = None
+    provider: Optional[str] = None
+    model: Optional[str] = None
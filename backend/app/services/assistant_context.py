@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.core import metrics
+from app.models import User
+
+# Version counters for the data the assistant puts into its prompt, kept per worker.
+# A user's scope changes when their own rows change; shared data (maintenance
+# rules) affects everyone; privileged users see every user's rows.
+_lock = threading.Lock()
+_user_versions: dict[int, int] = {}
+_shared_version = 0
+_all_users_version = 0
+
+# Rendered context text per user, valid while the context version matches. The TTL
+# bounds staleness from writes handled by other workers.
+CONTEXT_SNAPSHOT_CACHE_SIZE = int(os.getenv("ASSISTANT_CONTEXT_CACHE_SIZE", "1024"))
+CONTEXT_SNAPSHOT_TTL_SECONDS = float(os.getenv("ASSISTANT_CONTEXT_TTL_SECONDS", "300"))
+
+_snapshots: "OrderedDict[int, tuple[tuple, float, str]]" = OrderedDict()
+_snapshots_lock = threading.Lock()
+
+
+def invalidate_user_context(*user_ids: int | None) -> None:
+    global _all_users_version
+    with _lock:
+        for user_id in user_ids:
+            if user_id is not None:
+                _user_versions[user_id] = _user_versions.get(user_id, 0) + 1
+        _all_users_version += 1
+
+
+def invalidate_shared_context() -> None:
+    global _shared_version
+    with _lock:
+        _shared_version += 1
+
+
+def context_version(current_user: User) -> tuple[int, int, int]:
+    with _lock:
+        return (
+            _user_versions.get(current_user.id, 0),
+            _shared_version,
+            _all_users_version if current_user.role in {"admin", "dev"} else 0,
+        )
+
+
+def scope_version(user_id: int | None) -> int:
+    # Version of one user's own rows, or of all users' rows when user_id is None.
+    with _lock:
+        return _all_users_version if user_id is None else _user_versions.get(user_id, 0)
+
+
+def _snapshot_signature(current_user: User, version: tuple[int, int, int]) -> tuple:
+    # Username and role are rendered into the context too.
+    return (version, current_user.username, current_user.role)
+
+
+def get_context_snapshot(current_user: User, version: tuple[int, int, int]) -> str | None:
+    signature = _snapshot_signature(current_user, version)
+    with _snapshots_lock:
+        entry = _snapshots.get(current_user.id)
+        if entry is not None and (entry[0] != signature or time.monotonic() - entry[1] >= CONTEXT_SNAPSHOT_TTL_SECONDS):
+            del _snapshots[current_user.id]
+            entry = None
+        if entry is not None:
+            _snapshots.move_to_end(current_user.id)
+
+    if entry is None:
+        metrics.increment("assistant.context_cache.misses")
+        return None
+    metrics.increment("assistant.context_cache.hits")
+    return entry[2]
+
+
+def store_context_snapshot(current_user: User, version: tuple[int, int, int], context: str) -> None:
+    # The version must be read before the context is built, so a write that lands
+    # during the build leaves a snapshot that no longer matches.
+    with _snapshots_lock:
+        _snapshots[current_user.id] = (_snapshot_signature(current_user, version), time.monotonic(), context)
+        _snapshots.move_to_end(current_user.id)
+        while len(_snapshots) > CONTEXT_SNAPSHOT_CACHE_SIZE:
+            _snapshots.popitem(last=False)
+        size = len(_snapshots)
+    metrics.set_gauge("assistant.context_cache.size", size)
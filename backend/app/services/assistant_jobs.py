@@ -0,0 +1,198 @@
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.db.session import SessionLocal
+from app.models import AssistantChat, AssistantJob, User
+from app.services.assistant_service import answer_stored_message, find_stored_reply, store_user_message
+
+# LLM-backed turns run on a small worker pool next to the API process. Jobs live in
+# Postgres so any worker in any process can claim them with FOR UPDATE SKIP LOCKED.
+JOB_WORKERS = int(os.getenv("ASSISTANT_JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("ASSISTANT_JOB_POLL_INTERVAL_SECONDS", "1.0"))
+JOB_STALE_SECONDS = int(os.getenv("ASSISTANT_JOB_STALE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("ASSISTANT_JOB_MAX_ATTEMPTS", "3"))
+
+JOB_ACTIVE_STATUSES = ("queued", "running")
+JOB_FINAL_STATUSES = ("done", "failed")
+
+_workers: list[threading.Thread] = []
+_workers_lock = threading.Lock()
+_stop = threading.Event()
+_wake = threading.Event()
+
+
+def enqueue_message(db: Session, current_user: User, chat_id: str, message: str) -> AssistantJob:
+    active = (
+        db.query(AssistantJob.id)
+        .filter(AssistantJob.chat_id == chat_id, AssistantJob.status.in_(JOB_ACTIVE_STATUSES))
+        .first()
+    )
+    if active:
+        raise HTTPException(status_code=409, detail="Previous message is still being processed")
+
+    chat, user_message = store_user_message(db, current_user, chat_id, message)
+    job = AssistantJob(
+        id=str(uuid.uuid4()),
+        chat_id=chat.id,
+        user_id=current_user.id,
+        user_message_id=user_message.id,
+        status="queued",
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost the race against a concurrent enqueue for the same chat.
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Previous message is still being processed")
+    db.refresh(job)
+
+    metrics.increment("assistant.jobs.enqueued")
+    _wake.set()
+    return job
+
+
+def get_job(db: Session, current_user: User, job_id: str) -> AssistantJob:
+    job = db.query(AssistantJob).filter(AssistantJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.user_id != current_user.id and current_user.role not in {"admin", "dev"}:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return job
+
+
+def job_result(job: AssistantJob) -> dict[str, Any]:
+    if not job.result_json:
+        return {}
+    try:
+        return json.loads(job.result_json)
+    except ValueError:
+        return {}
+
+
+def _claim_next_job(db: Session) -> AssistantJob | None:
+    # Running jobs whose worker died are picked up again once they go stale.
+    stale_before = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+    job = (
+        db.query(AssistantJob)
+        .filter(
+            or_(
+                AssistantJob.status == "queued",
+                and_(AssistantJob.status == "running", AssistantJob.started_at < stale_before),
+            )
+        )
+        .order_by(AssistantJob.created_at.asc())
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if job is None:
+        db.rollback()
+        return None
+
+    job.status = "running"
+    job.started_at = datetime.utcnow()
+    job.attempts = (job.attempts or 0) + 1
+    db.commit()
+    return job
+
+
+def _finish_job(db: Session, job: AssistantJob, result: dict[str, Any]) -> None:
+    job.status = "done"
+    job.assistant_message_id = result["assistant_message"].id
+    job.result_json = json.dumps(
+        {
+            "answer": result["answer"],
+            "intent": result.get("intent"),
+            "action_json": result.get("action_json"),
+            "provider": result["provider"],
+            "model": result["model"],
+        },
+        ensure_ascii=False,
+    )
+    job.error = None
+    job.finished_at = datetime.utcnow()
+    db.commit()
+
+
+def _run_job(db: Session, job: AssistantJob) -> None:
+    started = time.perf_counter()
+    try:
+        user = db.query(User).filter(User.id == job.user_id).first()
+        chat = db.query(AssistantChat).filter(AssistantChat.id == job.chat_id).first()
+        if user is None or chat is None:
+            raise RuntimeError("Chat or user no longer exists")
+
+        user_message = job.user_message
+        # A retried job whose previous attempt committed the reply must not answer twice.
+        result = find_stored_reply(db, user_message) or answer_stored_message(db, user, chat, user_message)
+        _finish_job(db, job, result)
+        metrics.increment("assistant.jobs.done")
+    except Exception as error:
+        db.rollback()
+        job.error = str(error)[:1000]
+        if job.attempts >= JOB_MAX_ATTEMPTS:
+            job.status = "failed"
+            job.finished_at = datetime.utcnow()
+            metrics.increment("assistant.jobs.failed")
+        else:
+            job.status = "queued"
+            metrics.increment("assistant.jobs.retried")
+        db.commit()
+    finally:
+        metrics.observe("assistant.jobs.run", time.perf_counter() - started)
+
+
+def process_next_job() -> bool:
+    db = SessionLocal()
+    try:
+        job = _claim_next_job(db)
+        if job is None:
+            return False
+        metrics.observe("assistant.jobs.queue_wait", (job.started_at - job.created_at).total_seconds())
+        _run_job(db, job)
+        return True
+    finally:
+        db.close()
+
+
+def _worker_loop() -> None:
+    while not _stop.is_set():
+        try:
+            processed = process_next_job()
+        except Exception:
+            metrics.increment("assistant.jobs.worker_errors")
+            processed = False
+        if not processed:
+            _wake.wait(JOB_POLL_INTERVAL_SECONDS)
+            _wake.clear()
+
+
+def start_job_workers() -> None:
+    with _workers_lock:
+        if _workers:
+            return
+        _stop.clear()
+        for index in range(JOB_WORKERS):
+            worker = threading.Thread(target=_worker_loop, name=f"assistant-job-{index}", daemon=True)
+            worker.start()
+            _workers.append(worker)
+
+
+def stop_job_workers() -> None:
+    with _workers_lock:
+        _stop.set()
+        _wake.set()
+        for worker in _workers:
+            worker.join(timeout=5)
+        _workers.clear()
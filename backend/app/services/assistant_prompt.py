@@ -0,0 +1,92 @@
+import os
+import re
+
+from app.models import AssistantMessage
+
+# Token counts are estimated from characters; mixed Russian/English text averages
+# roughly three characters per Gemini token.
+CHARS_PER_TOKEN = 3
+HISTORY_TOKEN_BUDGET = int(os.getenv("ASSISTANT_HISTORY_TOKEN_BUDGET", "2000"))
+HISTORY_MAX_MESSAGES = int(os.getenv("ASSISTANT_HISTORY_MAX_MESSAGES", "12"))
+HISTORY_RECENT_MESSAGES = int(os.getenv("ASSISTANT_HISTORY_RECENT_MESSAGES", "4"))
+MESSAGE_TOKEN_LIMIT = int(os.getenv("ASSISTANT_MESSAGE_TOKEN_LIMIT", "600"))
+SUMMARY_TOKEN_LIMIT = int(os.getenv("ASSISTANT_SUMMARY_TOKEN_LIMIT", "500"))
+SUMMARY_FOLD_LIMIT = int(os.getenv("ASSISTANT_SUMMARY_FOLD_LIMIT", "40"))
+SUMMARY_LINE_CHARS = 240
+
+_TERM_PATTERN = re.compile(r"[a-zа-я0-9]{3,}")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_SUMMARY_ROLES = {"user": "Пользователь", "assistant": "Ассистент"}
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[: max(0, max_chars - 1)].rstrip() + "…"
+
+
+def _terms(text: str) -> set[str]:
+    return {term[:6] for term in _TERM_PATTERN.findall(text.lower().replace("ё", "е"))}
+
+
+def split_history(messages: list[AssistantMessage]) -> tuple[list[AssistantMessage], list[AssistantMessage]]:
+    # Messages outside the window are covered by the chat summary instead.
+    window_start = max(0, len(messages) - HISTORY_MAX_MESSAGES)
+    return messages[:window_start], messages[window_start:]
+
+
+def select_history(window: list[AssistantMessage], current_message: str) -> list[AssistantMessage]:
+    # The latest turns always go first; older messages from the window compete for
+    # the rest of the budget by term overlap with the current message.
+    candidates = [message for message in window if message.content.strip()]
+    recent = candidates[-HISTORY_RECENT_MESSAGES:] if HISTORY_RECENT_MESSAGES > 0 else []
+    older = candidates[: len(candidates) - len(recent)]
+
+    current_terms = _terms(current_message)
+    ranked = sorted(
+        range(len(older)),
+        key=lambda index: (len(current_terms & _terms(older[index].content)), index),
+        reverse=True,
+    )
+
+    selected: set[int] = set()
+    budget = HISTORY_TOKEN_BUDGET
+    for message in reversed(recent):
+        cost = min(estimate_tokens(message.content), MESSAGE_TOKEN_LIMIT)
+        if cost > budget:
+            break
+        budget -= cost
+        selected.add(id(message))
+
+    if len(selected) == len(recent):
+        for index in ranked:
+            cost = min(estimate_tokens(older[index].content), MESSAGE_TOKEN_LIMIT)
+            if cost <= budget:
+                budget -= cost
+                selected.add(id(older[index]))
+
+    return [message for message in candidates if id(message) in selected]
+
+
+def _summary_line(message: AssistantMessage) -> str:
+    text = _WHITESPACE_PATTERN.sub(" ", message.content).strip()
+    if len(text) > SUMMARY_LINE_CHARS:
+        text = text[: SUMMARY_LINE_CHARS - 1].rstrip() + "…"
+    return f"- {_SUMMARY_ROLES.get(message.role, message.role)}: {text}"
+
+
+def extend_summary(summary: str | None, messages: list[AssistantMessage]) -> str:
+    # Extractive and append-only: each folded message becomes one short line and the
+    # oldest lines are dropped once the summary exceeds its budget.
+    lines = [line for line in (summary or "").splitlines() if line.strip()]
+    lines.extend(_summary_line(message) for message in messages if message.content.strip())
+
+    total = sum(estimate_tokens(line) + 1 for line in lines)
+    while lines and total > SUMMARY_TOKEN_LIMIT:
+        total -= estimate_tokens(lines.pop(0)) + 1
+    return "\n".join(lines)
@@ -1,19 +1,34 @@
+import asyncio
 import base64
 import hashlib
 import json
+import os
 import re
-import urllib.error
+import threading
+import time
 import urllib.parse
-import urllib.request
 import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Any
+from functools import lru_cache
+from typing import Any, AsyncIterator
 
 from fastapi import HTTPException
-from sqlalchemy import func
+from sqlalchemy import func, tuple_
 from sqlalchemy.orm import Session, joinedload
-
-from app.core.security import decrypt_secret
+from starlette.concurrency import run_in_threadpool
+
+from app.core import metrics
+from app.core.security import decrypt_user_secret
+from app.db.session import SessionLocal
+from app.services.assistant_context import context_version, get_context_snapshot, invalidate_user_context, store_context_snapshot
+from app.services.assistant_prompt import HISTORY_MAX_MESSAGES, MESSAGE_TOKEN_LIMIT, SUMMARY_FOLD_LIMIT, extend_summary, select_history, split_history, truncate_to_tokens
+from app.services.car_index import get_car_index
+from app.services.gemini_client import AsyncGeminiClient, GeminiAPIError, get_async_gemini_client, get_gemini_client
+from app.services.llm_limits import llm_limiter
+from app.services.model_health import model_health
+from app.services.plan_cache import PLAN_CACHE_MODEL, plan_cache, plan_cache_key
+from app.services.signal_matcher import SignalMatcher
 from app.models import Car, DamageReport, Invoice, MaintenanceRule, ServiceBookEntry, ServiceOrder, AssistantChat, AssistantMessage, User
 
 GEMINI_MODELS = [
@@ -30,6 +45,47 @@ MODEL_EXCLUDE_PATTERNS = (
     "gemma",
 )
 
+# Discovered model lists are cached per API key (by hash) and shared by all
+# requests in the worker; stale entries are served while a refresh runs.
+MODEL_DISCOVERY_TTL_SECONDS = int(os.getenv("GEMINI_MODEL_DISCOVERY_TTL_SECONDS", "900"))
+MODEL_DISCOVERY_CACHE_SIZE = int(os.getenv("GEMINI_MODEL_DISCOVERY_CACHE_SIZE", "256"))
+
+# Hedging: if the current model has not answered within the delay, the next
+# candidate is called in parallel and the first usable plan wins. 0 disables it.
+GEMINI_HEDGE_DELAY_MS = int(os.getenv("GEMINI_HEDGE_DELAY_MS", "0"))
+GEMINI_HEDGE_MAX_IN_FLIGHT = int(os.getenv("GEMINI_HEDGE_MAX_IN_FLIGHT", "2"))
+
+# Chat detail responses carry the latest page of messages; older pages are fetched
+# with a keyset cursor on (created_at, id).
+CHAT_PAGE_SIZE = int(os.getenv("ASSISTANT_CHAT_PAGE_SIZE", "50"))
+CHAT_PAGE_MAX_SIZE = 200
+
+# Chat listings read denormalized counters and page on (user_id, updated_at, id).
+CHAT_LIST_SIZE = int(os.getenv("ASSISTANT_CHAT_LIST_SIZE", "50"))
+CHAT_LIST_MAX_SIZE = 200
+CHAT_PREVIEW_LENGTH = 200
+
+# Rule-based plans at or above this confidence are executed without calling the LLM.
+RULE_CONFIDENCE_THRESHOLD = float(os.getenv("ASSISTANT_RULE_CONFIDENCE_THRESHOLD", "0.85"))
+RULE_INTENT_CONFIDENCE = {
+    "count_entities": 0.95,
+    "list_cars": 0.9,
+    "list_orders": 0.9,
+    "list_invoices": 0.9,
+    "list_damage_reports": 0.9,
+    "list_service_book": 0.9,
+    "get_car_attribute": 0.9,
+    "show_capabilities": 0.9,
+    "booking_status": 0.9,
+    "create_booking": 0.6,
+    "none": 0.9,
+}
+RULE_LONG_MESSAGE_WORDS = 12
+
+_model_discovery_cache: "OrderedDict[str, tuple[float, list[str]]]" = OrderedDict()
+_model_discovery_refreshing: set[str] = set()
+_model_discovery_lock = threading.Lock()
+
 SYSTEM_PROMPT = """You are an assistant for a car service web app.
 Respond in Russian.
 Service name: CAR API.
@@ -105,6 +161,8 @@ ENTITY_LABELS = {
     "maintenance_rules": "регламентов",
 }
 
+CURRENCY_SYMBOLS = {"KZT": "₸", "RUB": "₽", "USD": "$", "EUR": "€"}
+
 COUNT_REQUEST_TOKENS = ("сколько", "количество", "число", "count")
 COUNT_REQUEST_PATTERNS = (
     r"\bс?кольк[оа]?\b",  # "сколько" + частая опечатка "колько"
@@ -113,6 +171,15 @@ COUNT_REQUEST_PATTERNS = (
     r"\bcount\b",
 )
 LIST_REQUEST_TOKENS = ("список", "покажи", "покажи мне", "перечисли", "какие", "что есть", "что у меня")
+HELP_REQUEST_TOKENS = ("что ты умеешь", "что можешь", "помощь", "возможности", "что доступно", "что я могу сделать")
+SERVICE_NAME_TOKENS = ("как сервис называется", "название сервиса", "как называется сервис", "имя сервиса")
+BOOKING_STATUS_TOKENS = ("статус заявки", "статус заказа", "заявка ord-", "заказ ord-")
+BOOKING_REQUEST_TOKENS = ("запиши", "записать", "запись", "запланируй", "создай запись")
+DAMAGE_ACTION_TOKENS = ("создай", "оформи", "открой", "заведи", "добавь")
+DAMAGE_KIND_TOKENS = ("поврежден", "повреждение", "вмятина", "царапина", "трещина", "скол")
+# Cues of questions about money the rule planner has no intent for (prices, amounts paid).
+PRICE_REQUEST_TOKENS = ("стоит", "стоимость", "цена", "цену", "почем", "почём", "прайс", "price", "cost")
+PAYMENT_REQUEST_TOKENS = ("заплатил", "оплатил", "потратил", "сумма", "сумму", "итого", "paid", "spent")
 ALLOWED_INTENTS = {
     "none",
     "count_entities",
@@ -183,39 +250,67 @@ def _is_privileged_user(current_user: User) -> bool:
     return current_user.role in PRIVILEGED_ROLES
 
 
-def _match_any_pattern(text: str, patterns: tuple[str, ...]) -> bool:
-    return any(re.search(pattern, text, flags=re.IGNORECASE) for pattern in patterns)
+def _build_signal_matcher() -> SignalMatcher:
+    signals: dict[str, tuple[str, ...]] = {}
+    for entity, patterns in ENTITY_PATTERNS.items():
+        signals[f"entity_{entity}"] = patterns
+    for attribute, patterns in CAR_ATTRIBUTE_PATTERNS.items():
+        signals[f"attribute_{attribute}"] = patterns
+    tokens = {
+        "count": COUNT_REQUEST_TOKENS,
+        "list": LIST_REQUEST_TOKENS,
+        "help": HELP_REQUEST_TOKENS,
+        "service_name": SERVICE_NAME_TOKENS,
+        "booking_status": BOOKING_STATUS_TOKENS,
+        "booking": BOOKING_REQUEST_TOKENS,
+        "damage_action": DAMAGE_ACTION_TOKENS,
+        "damage_kind": DAMAGE_KIND_TOKENS,
+        "price": PRICE_REQUEST_TOKENS,
+        "payment": PAYMENT_REQUEST_TOKENS,
+    }
+    for name, values in tokens.items():
+        signals[name] = tuple(re.escape(value) for value in values)
+    signals["count"] = signals["count"] + COUNT_REQUEST_PATTERNS
+    return SignalMatcher(signals)
+
+
+_SIGNAL_MATCHER = _build_signal_matcher()
+
+
+@lru_cache(maxsize=1024)
+def _message_signals(text: str) -> frozenset[str]:
+    # The planner asks about the same message several times per turn.
+    return _SIGNAL_MATCHER.match(text)
 
 
 def _request_contains_count_question(text: str) -> bool:
-    lowered = text.lower()
-    if any(token in lowered for token in COUNT_REQUEST_TOKENS):
-        return True
-    return any(re.search(pattern, lowered, flags=re.IGNORECASE) for pattern in COUNT_REQUEST_PATTERNS)
+    return "count" in _message_signals(text)
 
 
 def _request_contains_list_question(text: str) -> bool:
-    lowered = text.lower()
-    return any(token in lowered for token in LIST_REQUEST_TOKENS)
+    return "list" in _message_signals(text)
 
 
 def _request_contains_help_question(text: str) -> bool:
+    return "help" in _message_signals(text)
+
+
+def _damage_match_is_count_word(text: str) -> bool:
+    # "скол" (a chip) is also the start of "сколько"; such matches are not damage requests.
     lowered = text.lower()
-    return any(
-        token in lowered
-        for token in (
-            "что ты умеешь",
-            "что можешь",
-            "помощь",
-            "возможности",
-            "что доступно",
-            "что я могу сделать",
-        )
+    return all(
+        match.group(0).startswith("сколь")
+        for pattern in ENTITY_PATTERNS["damage_reports"]
+        for match in re.finditer(pattern, lowered)
     )
 
 
 def _detect_requested_entities(text: str) -> list[str]:
-    return [entity for entity, patterns in ENTITY_PATTERNS.items() if _match_any_pattern(text, patterns)]
+    signals = _message_signals(text)
+    entities = [entity for entity in ENTITY_PATTERNS if f"entity_{entity}" in signals]
+    if "damage_reports" in entities and _damage_match_is_count_word(text):
+        entities.remove("damage_reports")
+    return entities
 
 
 def _scoped_car_query(db: Session, current_user: User):
@@ -226,25 +321,29 @@ def _scoped_car_query(db: Session, current_user: User):
 
 
 def _detect_car_attribute(text: str) -> str | None:
-    lowered = text.lower()
-    for attribute, patterns in CAR_ATTRIBUTE_PATTERNS.items():
-        if _match_any_pattern(lowered, patterns):
+    signals = _message_signals(text)
+    for attribute in CAR_ATTRIBUTE_PATTERNS:
+        if f"attribute_{attribute}" in signals:
             return attribute
     return None
 
 
+def _car_index_owner(current_user: User) -> int | None:
+    return None if _is_privileged_user(current_user) else current_user.id
+
+
+def _only_car(query) -> Car | None:
+    cars = query.order_by(Car.id.asc()).limit(2).all()
+    return cars[0] if len(cars) == 1 else None
+
+
 def _match_scoped_car_from_text(db: Session, current_user: User, text: str) -> Car | None:
-    lowered = text.lower()
-    cars = _scoped_car_query(db, current_user).all()
-    for car in cars:
-        brand = (car.brand or "").strip().lower()
-        model = (car.model or "").strip().lower()
-        vin = (car.vin or "").strip().lower()
-        if (brand and brand in lowered) or (model and model in lowered) or (vin and vin in lowered):
+    car_id = get_car_index(db, _car_index_owner(current_user)).find(text)
+    if car_id is not None:
+        car = _scoped_car_query(db, current_user).filter(Car.id == car_id).first()
+        if car:
             return car
-    if len(cars) == 1:
-        return cars[0]
-    return None
+    return _only_car(_scoped_car_query(db, current_user))
 
 
 def _scoped_order_query(db: Session, current_user: User):
@@ -282,20 +381,30 @@ def _scoped_maintenance_rules_query(db: Session, current_user: User):
     return query
 
 
-def _entity_count(db: Session, current_user: User, entity: str) -> int:
+def _entity_count_query(db: Session, current_user: User, entity: str):
     if entity == "cars":
-        return int(_scoped_car_query(db, current_user).with_entities(func.count(Car.id)).scalar() or 0)
+        return _scoped_car_query(db, current_user).with_entities(func.count(Car.id))
     if entity == "orders":
-        return int(_scoped_order_query(db, current_user).with_entities(func.count(ServiceOrder.id)).scalar() or 0)
+        return _scoped_order_query(db, current_user).with_entities(func.count(ServiceOrder.id))
     if entity == "invoices":
-        return int(_scoped_invoice_query(db, current_user).with_entities(func.count(Invoice.id)).scalar() or 0)
+        return _scoped_invoice_query(db, current_user).with_entities(func.count(Invoice.id))
     if entity == "damage_reports":
-        return int(_scoped_damage_query(db, current_user).with_entities(func.count(DamageReport.id)).scalar() or 0)
+        return _scoped_damage_query(db, current_user).with_entities(func.count(DamageReport.id))
     if entity == "service_book":
-        return int(_scoped_service_book_query(db, current_user).with_entities(func.count(ServiceBookEntry.id)).scalar() or 0)
+        return _scoped_service_book_query(db, current_user).with_entities(func.count(ServiceBookEntry.id))
     if entity == "maintenance_rules":
-        return int(_scoped_maintenance_rules_query(db, current_user).with_entities(func.count(MaintenanceRule.id)).scalar() or 0)
-    return 0
+        return _scoped_maintenance_rules_query(db, current_user).with_entities(func.count(MaintenanceRule.id))
+    return None
+
+
+def _entity_counts(db: Session, current_user: User, entities: list[str]) -> dict[str, int]:
+    # All counts come back in one round trip: SELECT (SELECT count(...)), (SELECT count(...)), ...
+    queries = {entity: _entity_count_query(db, current_user, entity) for entity in entities}
+    columns = [query.scalar_subquery().label(entity) for entity, query in queries.items() if query is not None]
+    if not columns:
+        return {entity: 0 for entity in entities}
+    row = db.query(*columns).one()._mapping
+    return {entity: int(row.get(entity) or 0) for entity in entities}
 
 
 def _describe_count_entities(db: Session, current_user: User, entities: list[str]) -> tuple[str, dict[str, Any] | None]:
@@ -307,7 +416,7 @@ def _describe_count_entities(db: Session, current_user: User, entities: list[str
     if not unique_entities:
         return "", None
 
-    counts = {entity: _entity_count(db, current_user, entity) for entity in unique_entities}
+    counts = _entity_counts(db, current_user, unique_entities)
     if len(unique_entities) == 1:
         entity = unique_entities[0]
         return str(counts[entity]), {"entity": entity, "count": counts[entity]}
@@ -324,10 +433,9 @@ def _maybe_count_request(text: str, current_user: User) -> list[str] | None:
 
 
 def _maybe_list_request(text: str) -> str | None:
-    lowered = text.lower()
     if not _request_contains_list_question(text):
         return None
-    entities = _detect_requested_entities(lowered)
+    entities = _detect_requested_entities(text)
     return entities[0] if entities else None
 
 
@@ -341,15 +449,8 @@ def _build_site_capabilities_context() -> str:
 
 
 def _discover_gemini_models(api_key: str) -> list[str]:
-    endpoint = (
-        "https://generativelanguage.googleapis.com/v1beta/models"
-        f"?key={urllib.parse.quote(api_key)}"
-    )
-    req = urllib.request.Request(endpoint, method="GET")
     try:
-        with urllib.request.urlopen(req, timeout=20) as response:
-            raw = response.read().decode("utf-8")
-            data = json.loads(raw)
+        data = get_gemini_client().list_models(api_key)
     except Exception:
         return []
 
@@ -366,6 +467,58 @@ def _discover_gemini_models(api_key: str) -> list[str]:
     return discovered
 
 
+def _api_key_fingerprint(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def _store_discovered_models(fingerprint: str, models: list[str]) -> None:
+    with _model_discovery_lock:
+        _model_discovery_cache[fingerprint] = (time.monotonic(), models)
+        _model_discovery_cache.move_to_end(fingerprint)
+        while len(_model_discovery_cache) > MODEL_DISCOVERY_CACHE_SIZE:
+            _model_discovery_cache.popitem(last=False)
+
+
+def _refresh_discovered_models(fingerprint: str, api_key: str) -> None:
+    try:
+        _store_discovered_models(fingerprint, _discover_gemini_models(api_key))
+    finally:
+        with _model_discovery_lock:
+            _model_discovery_refreshing.discard(fingerprint)
+
+
+def _schedule_model_discovery(fingerprint: str, api_key: str) -> None:
+    with _model_discovery_lock:
+        if fingerprint in _model_discovery_refreshing:
+            return
+        _model_discovery_refreshing.add(fingerprint)
+    threading.Thread(
+        target=_refresh_discovered_models,
+        args=(fingerprint, api_key),
+        name="gemini-model-discovery",
+        daemon=True,
+    ).start()
+
+
+def _cached_gemini_models(api_key: str) -> list[str]:
+    # Never blocks on the network: a cold or expired entry triggers a background
+    # refresh and the caller falls back to the preferred static models.
+    fingerprint = _api_key_fingerprint(api_key)
+    with _model_discovery_lock:
+        entry = _model_discovery_cache.get(fingerprint)
+        if entry is not None:
+            _model_discovery_cache.move_to_end(fingerprint)
+
+    if entry is None:
+        _schedule_model_discovery(fingerprint, api_key)
+        return []
+
+    fetched_at, models = entry
+    if time.monotonic() - fetched_at >= MODEL_DISCOVERY_TTL_SECONDS:
+        _schedule_model_discovery(fingerprint, api_key)
+    return list(models)
+
+
 def _is_text_model_name(model_name: str) -> bool:
     lowered = model_name.lower()
     return not any(pattern in lowered for pattern in MODEL_EXCLUDE_PATTERNS)
@@ -408,6 +561,7 @@ def _build_user_context(db: Session, current_user: User) -> str:
     maintenance_rules = _scoped_maintenance_rules_query(db, current_user).order_by(MaintenanceRule.id.desc()).limit(10).all()
 
     scope_text = "all accessible data" if _is_privileged_user(current_user) else "own data only"
+    counts = _entity_counts(db, current_user, list(ENTITY_LABELS))
 
     car_lines = [
         f"- ID {car.id}: {car.brand} {car.model}, year {car.year}, mileage {int(car.mileage or 0):,} km, VIN {car.vin or 'not set'}"
@@ -446,12 +600,12 @@ def _build_user_context(db: Session, current_user: User) -> str:
         f"- Role: {current_user.role}\n"
         f"- Scope: {scope_text}\n\n"
         f"Counts:\n"
-        f"- Cars: {_entity_count(db, current_user, 'cars')}\n"
-        f"- Orders: {_entity_count(db, current_user, 'orders')}\n"
-        f"- Invoices: {_entity_count(db, current_user, 'invoices')}\n"
-        f"- Damage reports: {_entity_count(db, current_user, 'damage_reports')}\n"
-        f"- Service book entries: {_entity_count(db, current_user, 'service_book')}\n\n"
-        f"- Maintenance rules: {_entity_count(db, current_user, 'maintenance_rules')}\n\n"
+        f"- Cars: {counts['cars']}\n"
+        f"- Orders: {counts['orders']}\n"
+        f"- Invoices: {counts['invoices']}\n"
+        f"- Damage reports: {counts['damage_reports']}\n"
+        f"- Service book entries: {counts['service_book']}\n\n"
+        f"- Maintenance rules: {counts['maintenance_rules']}\n\n"
         f"Cars:\n" + "\n".join(car_lines) + "\n\n"
         f"Orders:\n" + "\n".join(order_lines) + "\n\n"
         f"Invoices:\n" + "\n".join(invoice_lines) + "\n\n"
@@ -484,6 +638,47 @@ def _extract_json_object(text: str) -> dict[str, Any]:
     return {"reply": stripped, "intent": "none", "data": {}, "action": None}
 
 
+_REPLY_FIELD_PATTERN = re.compile(r'"reply"\s*:\s*"')
+_JSON_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+
+def _partial_reply_text(raw: str) -> str:
+    # Decodes as much of the "reply" string as has arrived in a partial JSON plan.
+    stripped = raw.lstrip()
+    if stripped and stripped[0] not in "{`":
+        return stripped
+
+    matched = _REPLY_FIELD_PATTERN.search(raw)
+    if not matched:
+        return ""
+
+    chars: list[str] = []
+    index = matched.end()
+    while index < len(raw):
+        char = raw[index]
+        if char == '"':
+            break
+        if char != "\\":
+            chars.append(char)
+            index += 1
+            continue
+        if index + 1 >= len(raw):
+            break
+        escaped = raw[index + 1]
+        if escaped == "u":
+            if index + 6 > len(raw):
+                break
+            try:
+                chars.append(chr(int(raw[index + 2 : index + 6], 16)))
+            except ValueError:
+                break
+            index += 6
+            continue
+        chars.append(_JSON_ESCAPES.get(escaped, escaped))
+        index += 2
+    return "".join(chars)
+
+
 def _normalize_model_plan(raw_plan: dict[str, Any] | None) -> dict[str, Any]:
     if not isinstance(raw_plan, dict):
         return {"reply": "", "intent": "none", "data": {}, "action": None}
@@ -560,14 +755,23 @@ def _get_or_create_chat(db: Session, current_user: User, chat_id: str | None = N
     return chat
 
 
-def _message_history(chat: AssistantChat) -> list[dict[str, str]]:
-    history: list[dict[str, str]] = []
-    for message in chat.messages[-12:]:
-        history.append({"role": _to_gemini_role(message.role), "content": message.content})
-    return history
+def _message_history(chat: AssistantChat, recent: list[AssistantMessage], message_text: str) -> list[dict[str, str]]:
+    older, window = split_history(recent)
 
+    # Messages that left the window since the last turn are folded into the stored
+    # summary; it is committed together with the assistant reply.
+    pending = [message for message in older if chat.summary_message_id is None or message.id > chat.summary_message_id]
+    if pending:
+        chat.summary = extend_summary(chat.summary, pending)
+        chat.summary_message_id = pending[-1].id
 
-def _build_model_response(api_key: str, system_prompt: str, history: list[dict[str, str]], user_message: str) -> tuple[dict[str, Any], str]:
+    return [
+        {"role": _to_gemini_role(message.role), "content": truncate_to_tokens(message.content, MESSAGE_TOKEN_LIMIT)}
+        for message in select_history(window, message_text)
+    ]
+
+
+def _build_generation_body(system_prompt: str, history: list[dict[str, str]], user_message: str) -> dict[str, Any]:
     contents = [
         {"role": item["role"], "parts": [{"text": item["content"][:4000]}]}
         for item in history
@@ -575,81 +779,264 @@ def _build_model_response(api_key: str, system_prompt: str, history: list[dict[s
     ]
     contents.append({"role": "user", "parts": [{"text": user_message[:4000]}]})
 
-    body = {
+    return {
         "systemInstruction": {"parts": [{"text": system_prompt}]},
         "contents": contents,
         "generationConfig": {"temperature": 0.25, "maxOutputTokens": 1024},
     }
 
-    discovered_models = _discover_gemini_models(api_key)
-    model_candidates = _supported_model_candidates(discovered_models)
-    last_error = None
-    overload_detected = False
 
-    for model_name in model_candidates:
-        endpoint = (
-            "https://generativelanguage.googleapis.com/v1beta/models/"
-            f"{model_name}:generateContent?key={urllib.parse.quote(api_key)}"
-        )
-        req = urllib.request.Request(
-            endpoint,
-            data=json.dumps(body).encode("utf-8"),
-            headers={"Content-Type": "application/json"},
-            method="POST",
-        )
+def _parse_generation_response(data: dict[str, Any]) -> dict[str, Any]:
+    candidates = data.get("candidates") or []
+    if not candidates:
+        raise HTTPException(status_code=502, detail="Gemini returned empty response")
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    text_parts = [part.get("text", "") for part in parts if isinstance(part, dict)]
+    answer = "\n".join(part for part in text_parts if part).strip()
+    if not answer:
+        raise HTTPException(status_code=502, detail="Gemini returned no text")
+    return _extract_json_object(answer)
+
+
+def _is_retryable_model_error(error: GeminiAPIError) -> bool:
+    # True when the next candidate should be tried; raises for fatal errors.
+    if error.status_code in {404, 429, 503}:
+        return True
+    if error.status_code == 400 and _is_model_capability_error(error.details):
+        return True
+    if error.status_code == 400 and "API_KEY_INVALID" in error.details:
+        raise HTTPException(status_code=400, detail="Gemini API key is invalid")
+    raise HTTPException(status_code=502, detail=f"Gemini API error: {error.details[:250]}")
 
-        try:
-            with urllib.request.urlopen(req, timeout=40) as response:
-                raw = response.read().decode("utf-8")
-                data = json.loads(raw)
-                candidates = data.get("candidates") or []
-                if not candidates:
-                    raise HTTPException(status_code=502, detail="Gemini returned empty response")
-                parts = (candidates[0].get("content") or {}).get("parts") or []
-                text_parts = [part.get("text", "") for part in parts if isinstance(part, dict)]
-                answer = "\n".join(part for part in text_parts if part).strip()
-                if not answer:
-                    raise HTTPException(status_code=502, detail="Gemini returned no text")
-                parsed = _extract_json_object(answer)
-                return parsed, model_name
-        except urllib.error.HTTPError as e:
-            details = e.read().decode("utf-8", errors="ignore") if hasattr(e, "read") else str(e)
-            last_error = details
-            if e.code == 404:
-                continue
-            if e.code in {429, 503}:
-                overload_detected = True
-                continue
-            if e.code == 400 and _is_model_capability_error(details):
-                continue
-            if e.code == 400 and "API_KEY_INVALID" in details:
-                raise HTTPException(status_code=400, detail="Gemini API key is invalid")
-            raise HTTPException(status_code=502, detail=f"Gemini API error: {details[:250]}")
-        except Exception as e:
-            raise HTTPException(status_code=502, detail=f"Gemini connection error: {str(e)}")
-
-    if overload_detected:
-        return (
-            {
-                "reply": "Gemini сейчас перегружен. Попробуйте еще раз через минуту.",
-                "intent": "none",
-                "data": {},
-                "action": None,
-            },
-            model_candidates[0] if model_candidates else "gemini",
-        )
 
+def _record_model_error(fingerprint: str, model_name: str, error: GeminiAPIError) -> bool:
+    retryable = _is_retryable_model_error(error)
+    model_health.record_failure(fingerprint, model_name, overloaded=error.status_code in {429, 503})
+    return retryable
+
+
+def _record_connection_error(fingerprint: str, model_name: str, error: Exception) -> HTTPException:
+    model_health.record_failure(fingerprint, model_name, overloaded=True)
+    return HTTPException(status_code=502, detail=f"Gemini connection error: {str(error)}")
+
+
+def _model_candidates_for_key(api_key: str) -> tuple[str, list[str], list[str]]:
+    # Returns the key fingerprint, all candidates, and the ones worth calling now.
+    fingerprint = _api_key_fingerprint(api_key)
+    model_candidates = _supported_model_candidates(_cached_gemini_models(api_key))
+    return fingerprint, model_candidates, model_health.order_candidates(fingerprint, model_candidates)
+
+
+def _failure_reason(reason: str | None, error: GeminiAPIError) -> str | None:
+    # Overload wins over "unavailable" when candidates failed for different reasons.
+    if error.status_code in {429, 503}:
+        return "overloaded"
+    return reason or "unavailable"
+
+
+def _blocked_reason(fingerprint: str, model_candidates: list[str], healthy_candidates: list[str]) -> str | None:
+    # Every circuit open: the key is throttled, or its models are not available.
+    if healthy_candidates:
+        return None
+    return model_health.blocked_reason(fingerprint, model_candidates)
+
+
+def _model_fallback_response(model_candidates: list[str], reason: str | None) -> tuple[dict[str, Any], str]:
+    if reason == "overloaded":
+        reply = "Gemini сейчас перегружен. Попробуйте еще раз через минуту."
+    elif reason == "unavailable":
+        reply = "Модели Gemini для этого ключа сейчас недоступны. Попробуйте позже."
+    else:
+        reply = "Не удалось получить ответ от Gemini. Попробуйте позже."
     return (
-        {
-            "reply": "Не удалось получить ответ от Gemini. Попробуйте позже.",
-            "intent": "none",
-            "data": {},
-            "action": None,
-        },
+        {"reply": reply, "intent": "none", "data": {}, "action": None},
         model_candidates[0] if model_candidates else "gemini",
     )
 
 
+def _build_model_response(api_key: str, system_prompt: str, history: list[dict[str, str]], user_message: str) -> tuple[dict[str, Any], str]:
+    started = time.perf_counter()
+    try:
+        return _walk_model_candidates(api_key, _build_generation_body(system_prompt, history, user_message))
+    finally:
+        metrics.observe("assistant.llm.latency", time.perf_counter() - started)
+
+
+def _walk_model_candidates(api_key: str, body: dict[str, Any]) -> tuple[dict[str, Any], str]:
+    fingerprint, model_candidates, healthy_candidates = _model_candidates_for_key(api_key)
+    reason = _blocked_reason(fingerprint, model_candidates, healthy_candidates)
+    client = get_gemini_client()
+
+    attempted = 0
+    try:
+        for model_name in healthy_candidates:
+            attempted += 1
+            try:
+                parsed = _parse_generation_response(client.generate_content(api_key, model_name, body))
+            except GeminiAPIError as e:
+                if _record_model_error(fingerprint, model_name, e):
+                    reason = _failure_reason(reason, e)
+                    continue
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise _record_connection_error(fingerprint, model_name, e)
+            model_health.record_success(fingerprint, model_name)
+            return parsed, model_name
+    finally:
+        model_health.release_probes(fingerprint, healthy_candidates[attempted:])
+
+    return _model_fallback_response(model_candidates, reason)
+
+
+async def _call_model_async(client: AsyncGeminiClient, api_key: str, fingerprint: str, model_name: str, body: dict[str, Any]) -> dict[str, Any]:
+    # Retryable provider errors are recorded and re-raised as GeminiAPIError.
+    try:
+        parsed = _parse_generation_response(await client.generate_content(api_key, model_name, body))
+    except GeminiAPIError as e:
+        _record_model_error(fingerprint, model_name, e)
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise _record_connection_error(fingerprint, model_name, e)
+    model_health.record_success(fingerprint, model_name)
+    return parsed
+
+
+async def _hedged_model_response(api_key: str, fingerprint: str, candidates: list[str], body: dict[str, Any]) -> tuple[dict[str, Any] | None, str | None, str | None]:
+    client = get_async_gemini_client()
+    hedge_delay = GEMINI_HEDGE_DELAY_MS / 1000
+    queue = list(candidates)
+    pending: dict[asyncio.Task, str] = {}
+    primary_model = queue[0] if queue else None
+    reason = None
+    # A fatal error stops new launches, but attempts already in flight may still answer.
+    error: HTTPException | None = None
+
+    def launch() -> None:
+        model_name = queue.pop(0)
+        pending[asyncio.ensure_future(_call_model_async(client, api_key, fingerprint, model_name, body))] = model_name
+
+    try:
+        while pending or (queue and error is None):
+            if not pending:
+                launch()
+            can_hedge = bool(queue) and error is None and len(pending) < GEMINI_HEDGE_MAX_IN_FLIGHT
+            done, _ = await asyncio.wait(
+                pending,
+                timeout=hedge_delay if can_hedge else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                launch()
+                metrics.increment("assistant.llm.hedges_launched")
+                continue
+            for task in done:
+                model_name = pending.pop(task)
+                try:
+                    parsed = task.result()
+                except GeminiAPIError as e:
+                    reason = _failure_reason(reason, e)
+                    continue
+                except HTTPException as e:
+                    error = error or e
+                    continue
+                if model_name != primary_model:
+                    metrics.increment("assistant.llm.hedge_wins")
+                return parsed, model_name, reason
+        if error is not None:
+            raise error
+        return None, None, reason
+    finally:
+        for task in pending:
+            task.cancel()
+        # Cancelled calls and candidates never launched report no result.
+        model_health.release_probes(fingerprint, list(pending.values()) + queue)
+
+
+async def _build_model_response_async(api_key: str, system_prompt: str, history: list[dict[str, str]], user_message: str) -> tuple[dict[str, Any], str]:
+    started = time.perf_counter()
+    body = _build_generation_body(system_prompt, history, user_message)
+    fingerprint, model_candidates, healthy_candidates = _model_candidates_for_key(api_key)
+    hedge = GEMINI_HEDGE_DELAY_MS > 0 and len(healthy_candidates) > 1
+    try:
+        if hedge:
+            parsed, model_name, reason = await _hedged_model_response(api_key, fingerprint, healthy_candidates, body)
+        else:
+            parsed, model_name, reason = None, None, None
+            client = get_async_gemini_client()
+            attempted = 0
+            try:
+                for candidate in healthy_candidates:
+                    attempted += 1
+                    try:
+                        parsed, model_name = await _call_model_async(client, api_key, fingerprint, candidate, body), candidate
+                        break
+                    except GeminiAPIError as e:
+                        reason = _failure_reason(reason, e)
+            finally:
+                model_health.release_probes(fingerprint, healthy_candidates[attempted:])
+        if parsed is not None and model_name is not None:
+            return parsed, model_name
+        return _model_fallback_response(model_candidates, reason or _blocked_reason(fingerprint, model_candidates, healthy_candidates))
+    finally:
+        metrics.observe("assistant.llm.hedged_latency" if hedge else "assistant.llm.latency", time.perf_counter() - started)
+
+
+def _chunk_text(chunk: dict[str, Any]) -> str:
+    candidates = chunk.get("candidates") or []
+    if not candidates:
+        return ""
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts if isinstance(part, dict))
+
+
+async def _stream_model_response(
+    api_key: str,
+    system_prompt: str,
+    history: list[dict[str, str]],
+    user_message: str,
+) -> AsyncIterator[tuple[str, Any]]:
+    # Yields ("token", text) for reply deltas, then ("plan", (raw_plan, model_name)).
+    body = _build_generation_body(system_prompt, history, user_message)
+    fingerprint, model_candidates, healthy_candidates = _model_candidates_for_key(api_key)
+    reason = _blocked_reason(fingerprint, model_candidates, healthy_candidates)
+    client = get_async_gemini_client()
+
+    for index, model_name in enumerate(healthy_candidates):
+        raw_text = ""
+        emitted = ""
+        try:
+            async for chunk in client.stream_generate_content(api_key, model_name, body):
+                raw_text += _chunk_text(chunk)
+                reply_so_far = _partial_reply_text(raw_text)
+                if len(reply_so_far) > len(emitted):
+                    yield "token", reply_so_far[len(emitted):]
+                    emitted = reply_so_far
+        except GeminiAPIError as e:
+            if _record_model_error(fingerprint, model_name, e) and not emitted:
+                reason = _failure_reason(reason, e)
+                continue
+            model_health.release_probes(fingerprint, healthy_candidates[index + 1:])
+            raise HTTPException(status_code=502, detail=f"Gemini API error: {e.details[:250]}")
+        except HTTPException:
+            model_health.release_probes(fingerprint, healthy_candidates[index + 1:])
+            raise
+        except Exception as e:
+            model_health.release_probes(fingerprint, healthy_candidates[index + 1:])
+            raise _record_connection_error(fingerprint, model_name, e)
+
+        model_health.release_probes(fingerprint, healthy_candidates[index + 1:])
+        if not raw_text.strip():
+            raise HTTPException(status_code=502, detail="Gemini returned no text")
+        model_health.record_success(fingerprint, model_name)
+        yield "plan", (_extract_json_object(raw_text), model_name)
+        return
+
+    yield "plan", _model_fallback_response(model_candidates, reason)
+
+
 def _list_user_cars(db: Session, current_user: User) -> tuple[str, dict[str, Any] | None]:
     cars = _scoped_car_query(db, current_user).order_by(Car.id.desc()).all()
     if not cars:
@@ -779,15 +1166,14 @@ def _get_car_attribute_value(db: Session, current_user: User, data: dict[str, An
 
 def _create_booking(db: Session, current_user: User, data: dict[str, Any]) -> tuple[str, dict[str, Any] | None]:
     car_id = data.get("car_id")
-    cars = _scoped_car_query(db, current_user).order_by(Car.id.asc()).all()
     car: Car | None = None
 
     if car_id is not None:
         car = _scoped_car_query(db, current_user).filter(Car.id == int(car_id)).first()
-    elif len(cars) == 1:
-        car = cars[0]
     else:
-        return "Уточните, на какую машину записывать: у вас несколько автомобилей.", None
+        car = _only_car(_scoped_car_query(db, current_user))
+        if car is None:
+            return "Уточните, на какую машину записывать: у вас несколько автомобилей.", None
 
     if not car:
         return "Не нашёл машину для записи. Уточните car_id.", None
@@ -828,8 +1214,8 @@ def _create_booking(db: Session, current_user: User, data: dict[str, Any]) -> tu
         scheduled_at=scheduled_at,
     )
     db.add(order)
-    db.commit()
-    db.refresh(order)
+    # Committed together with the reply by _finish_turn, so a retried turn cannot book twice.
+    db.flush()
 
     return (
         f"Записал {car.brand} {car.model} на {service_name} на {scheduled_at.strftime('%d.%m.%Y %H:%M')}.",
@@ -867,16 +1253,26 @@ def _booking_status(db: Session, current_user: User, data: dict[str, Any]) -> tu
 
 
 def _sum_paid_invoices(db: Session, current_user: User) -> tuple[str, dict[str, Any] | None]:
-    invoices = _scoped_invoice_query(db, current_user).filter(Invoice.status == "paid").all()
-    if not invoices:
+    rows = (
+        _scoped_invoice_query(db, current_user)
+        .filter(Invoice.status == "paid")
+        .with_entities(Invoice.currency, func.count(Invoice.id), func.coalesce(func.sum(Invoice.total), 0))
+        .group_by(Invoice.currency)
+        .order_by(func.count(Invoice.id).desc(), Invoice.currency.asc())
+        .all()
+    )
+    if not rows:
         return "Оплаченных счетов не найдено.", {"count": 0, "total": 0}
 
-    total = float(sum(float(invoice.total or 0) for invoice in invoices))
-    prefix = "Сумма оплаченных счетов" if _is_privileged_user(current_user) else "Сумма оплаченных счетов"
-    return (
-        f"{prefix}: {int(total):,} ₸ (всего {len(invoices)}).".replace(",", " "),
-        {"count": len(invoices), "total": int(total), "currency": "KZT", "route": "/user/invoices"},
+    totals = [{"currency": currency or "KZT", "count": int(count), "total": int(float(total or 0))} for currency, count, total in rows]
+    count = sum(item["count"] for item in totals)
+    amounts = ", ".join(
+        f"{item['total']:,} {CURRENCY_SYMBOLS.get(item['currency'], item['currency'])}".replace(",", " ") for item in totals
     )
+    payload: dict[str, Any] = {"count": count, "total": totals[0]["total"], "currency": totals[0]["currency"], "route": "/user/invoices"}
+    if len(totals) > 1:
+        payload["totals"] = totals
+    return f"Сумма оплаченных счетов: {amounts} (всего {count}).", payload
 
 
 def _try_parse_time(text: str) -> str | None:
@@ -1018,16 +1414,13 @@ def _is_booking_followup(text: str) -> bool:
 
 
 def _match_user_car_from_text(db: Session, current_user: User, text: str) -> Car | None:
-    lowered = text.lower()
-    cars = db.query(Car).filter(Car.owner_id == current_user.id).all()
-    for car in cars:
-        brand = (car.brand or "").strip().lower()
-        model = (car.model or "").strip().lower()
-        if (brand and brand in lowered) or (model and model in lowered):
+    car_id = get_car_index(db, current_user.id).find(text, fields=("brand", "model"))
+    owned = db.query(Car).filter(Car.owner_id == current_user.id)
+    if car_id is not None:
+        car = owned.filter(Car.id == car_id).first()
+        if car:
             return car
-    if len(cars) == 1:
-        return cars[0]
-    return None
+    return _only_car(owned)
 
 
 def _infer_service_from_text(text: str) -> tuple[str, str]:
@@ -1069,26 +1462,84 @@ def _build_damage_prefill_route(text: str) -> str:
     return f"/user/damages/new?{params}"
 
 
-def _has_pending_booking(chat: AssistantChat) -> bool:
-    for message in reversed(chat.messages):
+def _has_pending_booking(history: list[AssistantMessage]) -> bool:
+    for message in reversed(history):
         if message.role == "assistant":
             return (message.intent or "") == "create_booking"
     return False
 
 
-def _recent_user_text(chat: AssistantChat, limit: int = 4) -> str:
-    user_messages = [m.content for m in chat.messages if m.role == "user" and m.content]
+def _recent_user_text(history: list[AssistantMessage], limit: int = 4) -> str:
+    user_messages = [m.content for m in history if m.role == "user" and m.content]
     if not user_messages:
         return ""
     return " ".join(user_messages[-limit:])
 
 
-def _rule_based_plan(db: Session, current_user: User, message: str, chat: AssistantChat | None = None) -> dict[str, Any] | None:
+def _rule_plan_confidence(plan: dict[str, Any], text: str) -> float:
+    intent = plan.get("intent") or "none"
+    data = plan.get("data") or {}
+    confidence = RULE_INTENT_CONFIDENCE.get(intent, 0.5)
+    if intent == "get_car_attribute" and "car_id" not in data:
+        confidence -= 0.3
+    if intent == "booking_status" and "order_id" not in data:
+        confidence -= 0.2
+    if intent == "count_entities" and len(data.get("entities") or []) > 1:
+        confidence -= 0.3
+
+    # A message that also looks like other requests, or a long free-form one, is
+    # left to the model.
+    signals = _message_signals(text)
+    families = [
+        "count" in signals,
+        "list" in signals,
+        "help" in signals,
+        "booking" in signals or "booking_status" in signals,
+        "damage_action" in signals and "damage_kind" in signals,
+        any(signal.startswith("attribute_") for signal in signals),
+    ]
+    if sum(families) > 1:
+        confidence -= 0.3
+    # Prices and amounts paid are get_price / sum_paid_invoices, which only the model plans.
+    if "price" in signals or "payment" in signals:
+        confidence -= 0.5
+    if len(text.split()) > RULE_LONG_MESSAGE_WORDS:
+        confidence -= 0.2
+    return round(max(0.0, confidence), 2)
+
+
+def _rule_based_plan(db: Session, current_user: User, message: str, history: list[AssistantMessage] | None = None) -> dict[str, Any] | None:
+    # The plan carries a "confidence" in [0, 1]; see _rule_plan_confidence.
+    plan = _match_rule_plan(db, current_user, message, history)
+    if plan is not None:
+        plan["confidence"] = _rule_plan_confidence(plan, message.strip())
+    return plan
+
+
+def _is_confident_rule_plan(rule_plan: dict[str, Any] | None) -> bool:
+    return rule_plan is not None and rule_plan.get("confidence", 0) >= RULE_CONFIDENCE_THRESHOLD
+
+
+def _turn_route(rule_plan: dict[str, Any] | None, cached_plan: dict[str, Any] | None, decrypted_key: str | None) -> str:
+    # "rules" (confident rule plan, no LLM call), "plan_cache", "no_key" (rules only)
+    # or "llm"; counted so /metrics can report the share of turns that skip the LLM.
+    if _is_confident_rule_plan(rule_plan):
+        route = "rules"
+    elif cached_plan is not None:
+        route = "plan_cache"
+    elif not decrypted_key:
+        route = "no_key"
+    else:
+        route = "llm"
+    metrics.increment(f"assistant.routing.{route}")
+    return route
+
+
+def _match_rule_plan(db: Session, current_user: User, message: str, history: list[AssistantMessage] | None = None) -> dict[str, Any] | None:
     text = message.strip()
     lowered = text.lower()
-    context_text = (lowered + " " + _recent_user_text(chat).lower()).strip() if chat else lowered
+    context_text = (lowered + " " + _recent_user_text(history).lower()).strip() if history is not None else lowered
 
-    # High-confidence fallback only when model output is missing/invalid.
     count_entities = _maybe_count_request(text, current_user)
     if count_entities:
         return {"intent": "count_entities", "data": {"entities": count_entities}, "reply": "", "action": None}
@@ -1114,21 +1565,21 @@ def _rule_based_plan(db: Session, current_user: User, message: str, chat: Assist
             payload["car_id"] = matched_car.id
         return {"intent": "get_car_attribute", "data": payload, "reply": "", "action": None}
 
-    if any(token in lowered for token in ("как сервис называется", "название сервиса", "как называется сервис", "имя сервиса")):
+    signals = _message_signals(text)
+    if "service_name" in signals:
         return {"intent": "none", "data": {}, "reply": "Сервис называется CAR API.", "action": None}
 
     if _request_contains_help_question(text):
         return {"intent": "show_capabilities", "data": {}, "reply": "", "action": None}
 
-    if any(token in lowered for token in ("статус заявки", "статус заказа", "заявка ord-", "заказ ord-")):
+    if "booking_status" in signals:
         order_match = re.search(r"(?:ord-|заказ\s*#?|заявка\s*#?)(\d+)", lowered)
         payload: dict[str, Any] = {}
         if order_match:
             payload["order_id"] = int(order_match.group(1))
         return {"intent": "booking_status", "data": payload, "reply": "", "action": None}
 
-    booking_tokens = ("запиши", "записать", "запись", "запланируй", "создай запись")
-    if any(token in lowered for token in booking_tokens):
+    if "booking" in signals:
         service_kind, service_name = _infer_service_from_text(context_text)
 
         date_part = _parse_relative_date(lowered)
@@ -1153,7 +1604,7 @@ def _rule_based_plan(db: Session, current_user: User, message: str, chat: Assist
             "action": {"type": "navigate", "route": "/user/booking"},
         }
 
-    if chat and _has_pending_booking(chat) and _is_booking_followup(lowered):
+    if history and _has_pending_booking(history) and _is_booking_followup(lowered):
         date_part = _parse_relative_date(lowered)
         time_part = _try_parse_time(lowered)
 
@@ -1179,8 +1630,7 @@ def _rule_based_plan(db: Session, current_user: User, message: str, chat: Assist
                 "action": {"type": "navigate", "route": "/user/booking"},
             }
 
-    damage_intent_tokens = ("создай", "оформи", "открой", "заведи", "добавь")
-    if any(token in lowered for token in damage_intent_tokens) and any(token in lowered for token in ("поврежден", "повреждение", "вмятина", "царапина", "трещина", "скол")):
+    if "damage_action" in signals and "damage_kind" in signals:
         return {
             "intent": "none",
             "data": {},
@@ -1252,33 +1702,125 @@ def delete_chat(db: Session, current_user: User, chat_id: str) -> None:
     db.commit()
 
 
-def list_chats(db: Session, current_user: User) -> list[AssistantChat]:
-    return (
-        db.query(AssistantChat)
-        .filter(AssistantChat.user_id == current_user.id)
-        .order_by(AssistantChat.updated_at.desc())
-        .all()
-    )
+def _encode_chat_cursor(chat: AssistantChat) -> str:
+    raw = json.dumps([chat.updated_at.isoformat(), chat.id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_chat_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        updated_at, chat_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(updated_at), str(chat_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def list_chats(db: Session, current_user: User, limit: int, cursor: str | None = None) -> tuple[list[AssistantChat], str | None]:
+    # Keyset page over (user_id, updated_at, id), newest first.
+    query = db.query(AssistantChat).filter(AssistantChat.user_id == current_user.id)
+    if cursor:
+        updated_at, chat_id = _decode_chat_cursor(cursor)
+        query = query.filter(tuple_(AssistantChat.updated_at, AssistantChat.id) < tuple_(updated_at, chat_id))
+
+    rows = query.order_by(AssistantChat.updated_at.desc(), AssistantChat.id.desc()).limit(limit + 1).all()
+    chats = rows[:limit]
+    next_cursor = _encode_chat_cursor(chats[-1]) if len(rows) > limit else None
+    return chats, next_cursor
 
 
 def get_chat(db: Session, current_user: User, chat_id: str) -> AssistantChat:
-    chat = (
-        db.query(AssistantChat)
-        .options(joinedload(AssistantChat.messages))
-        .filter(AssistantChat.id == chat_id)
-        .first()
-    )
+    chat = db.query(AssistantChat).filter(AssistantChat.id == chat_id).first()
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
     _resolve_chat_owner(db, chat, current_user)
     return chat
 
 
-def send_message(db: Session, current_user: User, chat_id: str, message: str) -> dict[str, Any]:
+def list_chat_messages(db: Session, chat_id: str, limit: int, before_id: int | None = None) -> tuple[list[AssistantMessage], bool]:
+    # Newest-first keyset page over (chat_id, created_at, id), returned oldest first.
+    query = db.query(AssistantMessage).filter(AssistantMessage.chat_id == chat_id)
+    if before_id is not None:
+        anchor = (
+            db.query(AssistantMessage.created_at, AssistantMessage.id)
+            .filter(AssistantMessage.chat_id == chat_id, AssistantMessage.id == before_id)
+            .first()
+        )
+        if not anchor:
+            raise HTTPException(status_code=404, detail="Message not found")
+        query = query.filter(tuple_(AssistantMessage.created_at, AssistantMessage.id) < tuple_(anchor.created_at, anchor.id))
+
+    rows = query.order_by(AssistantMessage.created_at.desc(), AssistantMessage.id.desc()).limit(limit + 1).all()
+    return list(reversed(rows[:limit])), len(rows) > limit
+
+
+def _recent_turn_messages(db: Session, chat: AssistantChat) -> list[AssistantMessage]:
+    # The history window plus a bounded tail of messages not yet folded into the summary.
+    query = db.query(AssistantMessage).filter(AssistantMessage.chat_id == chat.id)
+    if chat.summary_message_id is not None:
+        query = query.filter(AssistantMessage.id > chat.summary_message_id)
+    rows = (
+        query.order_by(AssistantMessage.created_at.desc(), AssistantMessage.id.desc())
+        .limit(HISTORY_MAX_MESSAGES + SUMMARY_FOLD_LIMIT)
+        .all()
+    )
+    return list(reversed(rows))
+
+
+def _user_api_key(current_user: User) -> str | None:
+    api_key = current_user.ai_api_key_encrypted
+    if not api_key:
+        return None
+    return decrypt_user_secret(current_user.id, api_key)
+
+
+def _model_prompt(user_context: str, summary: str | None = None) -> str:
+    prompt = SYSTEM_PROMPT + "\n\n" + _build_site_capabilities_context() + "\n\n" + user_context
+    if summary:
+        prompt += "\n\nEarlier conversation (summary):\n" + summary
+    return prompt
+
+
+def _cached_user_context(db: Session, current_user: User) -> str:
+    version = context_version(current_user)
+    context = get_context_snapshot(current_user, version)
+    if context is None:
+        context = _build_user_context(db, current_user)
+        store_context_snapshot(current_user, version, context)
+    return context
+
+
+def _build_user_context_in_session(current_user: User, version: tuple[int, int, int]) -> str:
+    # Uses its own session so it can run next to work on the request session.
+    db = SessionLocal()
+    try:
+        context = _build_user_context(db, current_user)
+    finally:
+        db.close()
+    store_context_snapshot(current_user, version, context)
+    return context
+
+
+def _user_context_future(current_user: User) -> "asyncio.Future[str]":
+    version = context_version(current_user)
+    context = get_context_snapshot(current_user, version)
+    if context is not None:
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(context)
+        return future
+    # The worker thread gets a transient copy: the request session may commit (and
+    # expire the original) on another thread while the context is being built.
+    user = User(id=current_user.id, username=current_user.username, role=current_user.role)
+    return asyncio.ensure_future(run_in_threadpool(_build_user_context_in_session, user, version))
+
+
+def _start_turn(
+    db: Session, current_user: User, chat_id: str, message: str
+) -> tuple[AssistantChat, AssistantMessage, dict[str, Any] | None, list[AssistantMessage]]:
     chat = get_chat(db, current_user, chat_id)
     if chat.user_id != current_user.id and current_user.role not in {"admin", "dev"}:
         raise HTTPException(status_code=403, detail="Forbidden")
 
+    recent = _recent_turn_messages(db, chat)
     message_text = message.strip()
     user_message = AssistantMessage(
         chat_id=chat.id,
@@ -1288,26 +1830,21 @@ def send_message(db: Session, current_user: User, chat_id: str, message: str) ->
     db.add(user_message)
     db.flush()
 
-    rule_plan = _rule_based_plan(db, current_user, message_text, chat=chat)
-    plan: dict[str, Any] | None = None
-    model_name = "rule-based"
-
-    api_key = current_user.ai_api_key_encrypted
-    if api_key:
-        decrypted_key = decrypt_secret(api_key)
-        if decrypted_key:
-            user_context = _build_user_context(db, current_user)
-            capabilities_context = _build_site_capabilities_context()
-            history = _message_history(chat)
-            prompt = SYSTEM_PROMPT + "\n\n" + capabilities_context + "\n\n" + user_context
-            try:
-                raw_plan, model_name = _build_model_response(decrypted_key, prompt, history, message_text)
-                plan = _normalize_model_plan(raw_plan)
-            except HTTPException:
-                plan = None
-            except Exception:
-                plan = None
-
+    rule_plan = _rule_based_plan(db, current_user, message_text, history=recent)
+    return chat, user_message, rule_plan, recent
+
+
+def _finish_turn(
+    db: Session,
+    current_user: User,
+    chat: AssistantChat,
+    user_message: AssistantMessage,
+    plan: dict[str, Any] | None,
+    model_name: str,
+    rule_plan: dict[str, Any] | None,
+    messages_added: int = 2,
+) -> dict[str, Any]:
+    message_text = user_message.content
     if (plan is None or (plan.get("intent") == "none" and not plan.get("reply"))) and rule_plan is not None:
         plan = rule_plan
         model_name = "rule-based"
@@ -1337,7 +1874,7 @@ def send_message(db: Session, current_user: User, chat_id: str, message: str) ->
         else:
             valid_entities = [str(entity) for entity in requested_entities if str(entity) in ENTITY_LABELS]
 
-        if not valid_entities and _match_any_pattern(message_text, ENTITY_PATTERNS["cars"]):
+        if not valid_entities and "entity_cars" in _message_signals(message_text):
             valid_entities = ["cars"]
 
         data = {**data, "entities": valid_entities} if isinstance(data, dict) else {"entities": valid_entities}
@@ -1390,19 +1927,202 @@ def send_message(db: Session, current_user: User, chat_id: str, message: str) ->
         content=reply,
         intent=intent if intent != "none" else None,
         action_json=json.dumps(action, ensure_ascii=False) if action else None,
+        reply_to_id=user_message.id,
+        model=model_name,
     )
     db.add(assistant_message)
 
+    now = datetime.utcnow()
     chat.title = chat.title if chat.title != "Новый чат" else (message_text[:40] or "Новый чат")
-    chat.updated_at = datetime.utcnow()
+    chat.updated_at = now
+    # Listing counters change in the same transaction as the messages themselves.
+    chat.messages_count = AssistantChat.messages_count + messages_added
+    chat.last_message_at = now
+    chat.last_message_preview = reply[:CHAT_PREVIEW_LENGTH]
 
     db.commit()
+    if intent == "create_booking" and command_action is not None:
+        invalidate_user_context(current_user.id)
     db.refresh(chat)
     return {
         "chat": chat,
+        "user_message": user_message,
+        "assistant_message": assistant_message,
         "answer": reply,
         "intent": intent if intent != "none" else None,
         "action_json": json.dumps(action, ensure_ascii=False) if action else None,
-        "provider": "gemini" if model_name != "rule-based" else "rules",
+        "provider": _provider_for_model(model_name),
+        "model": model_name,
+    }
+
+
+def _provider_for_model(model_name: str) -> str:
+    if model_name == "rule-based":
+        return "rules"
+    if model_name == PLAN_CACHE_MODEL:
+        return "cache"
+    return "gemini"
+
+
+def _lookup_cached_plan(current_user: User, message: str, decrypted_key: str | None) -> tuple[tuple | None, dict[str, Any] | None]:
+    # Only users who would hit the LLM use the cache; others already get rule plans.
+    if not decrypted_key:
+        return None, None
+    cache_key = plan_cache_key(current_user, message)
+    return cache_key, plan_cache.get(cache_key)
+
+
+def _route_turn(
+    current_user: User, message_text: str, rule_plan: dict[str, Any] | None, decrypted_key: str | None
+) -> tuple[str, tuple | None, dict[str, Any] | None]:
+    # A confident rule plan wins before the plan cache is consulted, so rules turns
+    # do not count as plan-cache misses.
+    if _is_confident_rule_plan(rule_plan):
+        cache_key, plan = None, None
+    else:
+        cache_key, plan = _lookup_cached_plan(current_user, message_text, decrypted_key)
+    return _turn_route(rule_plan, plan, decrypted_key), cache_key, plan
+
+
+def _plan_turn(
+    db: Session,
+    current_user: User,
+    chat: AssistantChat,
+    recent: list[AssistantMessage],
+    message_text: str,
+    rule_plan: dict[str, Any] | None,
+) -> tuple[dict[str, Any] | None, str]:
+    # None means the turn is answered by the rule-based plan.
+    decrypted_key = _user_api_key(current_user)
+    route, cache_key, plan = _route_turn(current_user, message_text, rule_plan, decrypted_key)
+    if route == "plan_cache":
+        return plan, PLAN_CACHE_MODEL
+    if route != "llm":
+        return None, "rule-based"
+
+    # Over the LLM limits the turn is answered by the rule-based plan instead.
+    with llm_limiter.slot(current_user.id, _api_key_fingerprint(decrypted_key)) as admitted:
+        if not admitted:
+            return None, "rule-based"
+        history = _message_history(chat, recent, message_text)
+        prompt = _model_prompt(_cached_user_context(db, current_user), chat.summary)
+        try:
+            raw_plan, model_name = _build_model_response(decrypted_key, prompt, history, message_text)
+        except Exception:
+            return None, "rule-based"
+    plan = _normalize_model_plan(raw_plan)
+    plan_cache.put(cache_key, plan)
+    return plan, model_name
+
+
+def send_message(db: Session, current_user: User, chat_id: str, message: str) -> dict[str, Any]:
+    chat, user_message, rule_plan, recent = _start_turn(db, current_user, chat_id, message)
+    plan, model_name = _plan_turn(db, current_user, chat, recent, user_message.content, rule_plan)
+    return _finish_turn(db, current_user, chat, user_message, plan, model_name, rule_plan)
+
+
+def store_user_message(db: Session, current_user: User, chat_id: str, message: str) -> tuple[AssistantChat, AssistantMessage]:
+    # Persists the user side of a turn on its own; the reply is produced later by
+    # answer_stored_message, which only adds the assistant message.
+    chat = get_chat(db, current_user, chat_id)
+    if chat.user_id != current_user.id and current_user.role not in {"admin", "dev"}:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    message_text = message.strip()
+    user_message = AssistantMessage(chat_id=chat.id, role="user", content=message_text)
+    db.add(user_message)
+
+    now = datetime.utcnow()
+    chat.updated_at = now
+    chat.messages_count = AssistantChat.messages_count + 1
+    chat.last_message_at = now
+    chat.last_message_preview = message_text[:CHAT_PREVIEW_LENGTH]
+    db.flush()
+    return chat, user_message
+
+
+def find_stored_reply(db: Session, user_message: AssistantMessage) -> dict[str, Any] | None:
+    # The reply committed for this exact user message, in answer_stored_message's result shape.
+    reply = (
+        db.query(AssistantMessage)
+        .filter(AssistantMessage.reply_to_id == user_message.id, AssistantMessage.role == "assistant")
+        .order_by(AssistantMessage.id.asc())
+        .first()
+    )
+    if reply is None:
+        return None
+    model_name = reply.model or "gemini"
+    return {
+        "assistant_message": reply,
+        "answer": reply.content,
+        "intent": reply.intent,
+        "action_json": reply.action_json,
+        "provider": _provider_for_model(model_name),
         "model": model_name,
     }
+
+
+def answer_stored_message(db: Session, current_user: User, chat: AssistantChat, user_message: AssistantMessage) -> dict[str, Any]:
+    recent = [message for message in _recent_turn_messages(db, chat) if message.id < user_message.id]
+    message_text = user_message.content
+    rule_plan = _rule_based_plan(db, current_user, message_text, history=recent)
+    plan, model_name = _plan_turn(db, current_user, chat, recent, message_text, rule_plan)
+    return _finish_turn(db, current_user, chat, user_message, plan, model_name, rule_plan, messages_added=1)
+
+
+async def send_message_async(db: Session, current_user: User, chat_id: str, message: str) -> dict[str, Any]:
+    # DB work runs in the threadpool; only the LLM call is awaited on the event loop.
+    decrypted_key = _user_api_key(current_user)
+    chat, user_message, rule_plan, recent = await run_in_threadpool(_start_turn, db, current_user, chat_id, message)
+
+    message_text = user_message.content
+    route, cache_key, plan = _route_turn(current_user, message_text, rule_plan, decrypted_key)
+    model_name = PLAN_CACHE_MODEL if route == "plan_cache" else "rule-based"
+
+    if route == "llm":
+        async with llm_limiter.slot_async(current_user.id, _api_key_fingerprint(decrypted_key)) as admitted:
+            if admitted:
+                try:
+                    history = _message_history(chat, recent, message_text)
+                    prompt = _model_prompt(await _user_context_future(current_user), chat.summary)
+                    raw_plan, model_name = await _build_model_response_async(decrypted_key, prompt, history, message_text)
+                    plan = _normalize_model_plan(raw_plan)
+                    plan_cache.put(cache_key, plan)
+                except Exception:
+                    plan = None
+                    model_name = "rule-based"
+
+    return await run_in_threadpool(_finish_turn, db, current_user, chat, user_message, plan, model_name, rule_plan)
+
+
+async def stream_message(db: Session, current_user: User, chat_id: str, message: str) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+    # Events: "start" once the user message is stored, "token" reply deltas while the
+    # model streams, then "message" after the assistant message is committed.
+    decrypted_key = _user_api_key(current_user)
+    chat, user_message, rule_plan, recent = await run_in_threadpool(_start_turn, db, current_user, chat_id, message)
+
+    yield "start", {"chat": chat, "user_message": user_message}
+
+    message_text = user_message.content
+    route, cache_key, plan = _route_turn(current_user, message_text, rule_plan, decrypted_key)
+    model_name = PLAN_CACHE_MODEL if route == "plan_cache" else "rule-based"
+
+    if route == "llm":
+        async with llm_limiter.slot_async(current_user.id, _api_key_fingerprint(decrypted_key)) as admitted:
+            if admitted:
+                try:
+                    history = _message_history(chat, recent, message_text)
+                    prompt = _model_prompt(await _user_context_future(current_user), chat.summary)
+                    async for event, value in _stream_model_response(decrypted_key, prompt, history, message_text):
+                        if event == "token":
+                            yield "token", {"text": value}
+                        else:
+                            raw_plan, model_name = value
+                            plan = _normalize_model_plan(raw_plan)
+                            plan_cache.put(cache_key, plan)
+                except Exception:
+                    plan = None
+                    model_name = "rule-based"
+
+    result = await run_in_threadpool(_finish_turn, db, current_user, chat, user_message, plan, model_name, rule_plan)
+    yield "message", result
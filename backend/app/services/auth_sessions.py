@@ -0,0 +1,153 @@
+import hashlib
+import os
+import secrets
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.models import AuthSession, User
+
+# Refresh tokens renew access tokens without a password check. Each use rotates the
+# token; presenting a rotated token again revokes the whole family, unless it happens
+# within the grace window (two tabs refreshing at once).
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+REFRESH_REUSE_GRACE_SECONDS = float(os.getenv("REFRESH_REUSE_GRACE_SECONDS", "10"))
+
+# Access tokens carry their session family as "sid" and die with it. Revocations are
+# final and remembered per worker; an active family is re-checked after
+# SESSION_CHECK_TTL_SECONDS, which bounds how long another worker accepts a
+# logged-out token (0 checks the database on every request).
+SESSION_CHECK_TTL_SECONDS = float(os.getenv("SESSION_CHECK_TTL_SECONDS", "5"))
+SESSION_CHECK_CACHE_SIZE = int(os.getenv("SESSION_CHECK_CACHE_SIZE", "4096"))
+
+_families: "OrderedDict[str, tuple[float, bool]]" = OrderedDict()
+_families_lock = threading.Lock()
+
+
+def _token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _issue(db: Session, user_id: int, family_id: str, now: datetime) -> str:
+    token = secrets.token_urlsafe(32)
+    db.add(
+        AuthSession(
+            user_id=user_id,
+            family_id=family_id,
+            token_hash=_token_hash(token),
+            created_at=now,
+            expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        )
+    )
+    return token
+
+
+def create_session(db: Session, user_id: int) -> tuple[str, str]:
+    # Returns the refresh token and the session family id for the access token's sid.
+    now = datetime.utcnow()
+    db.query(AuthSession).filter(AuthSession.user_id == user_id, AuthSession.expires_at < now).delete(synchronize_session=False)
+    family_id = str(uuid.uuid4())
+    token = _issue(db, user_id, family_id, now)
+    db.commit()
+    metrics.increment("auth.sessions.created")
+    return token, family_id
+
+
+def rotate_session(db: Session, token: str) -> tuple[User, str, str] | None:
+    now = datetime.utcnow()
+    session = (
+        db.query(AuthSession)
+        .filter(AuthSession.token_hash == _token_hash(token))
+        .with_for_update()
+        .first()
+    )
+    if session is None or session.revoked_at is not None or session.expires_at <= now:
+        db.rollback()
+        metrics.increment("auth.sessions.rejected")
+        return None
+
+    if session.rotated_at is not None:
+        if (now - session.rotated_at).total_seconds() > REFRESH_REUSE_GRACE_SECONDS:
+            _revoke_family(db, session.family_id, now)
+            db.commit()
+            _remember_family(session.family_id, True)
+            metrics.increment("auth.sessions.reuse_detected")
+        else:
+            db.rollback()
+            metrics.increment("auth.sessions.rejected")
+        return None
+
+    user = db.query(User).filter(User.id == session.user_id).first()
+    if user is None:
+        db.rollback()
+        return None
+
+    session.rotated_at = now
+    family_id = session.family_id
+    new_token = _issue(db, user.id, family_id, now)
+    db.commit()
+    metrics.increment("auth.sessions.rotated")
+    return user, new_token, family_id
+
+
+def _remember_family(family_id: str, revoked: bool) -> None:
+    with _families_lock:
+        _families[family_id] = (time.monotonic(), revoked)
+        _families.move_to_end(family_id)
+        while len(_families) > SESSION_CHECK_CACHE_SIZE:
+            _families.popitem(last=False)
+
+
+def _revoke_family(db: Session, family_id: str, now: datetime) -> None:
+    db.query(AuthSession).filter(AuthSession.family_id == family_id, AuthSession.revoked_at.is_(None)).update(
+        {AuthSession.revoked_at: now}, synchronize_session=False
+    )
+
+
+def session_revoked(db: Session, family_id: str) -> bool:
+    with _families_lock:
+        entry = _families.get(family_id)
+        if entry is not None and (entry[1] or time.monotonic() - entry[0] < SESSION_CHECK_TTL_SECONDS):
+            _families.move_to_end(family_id)
+            return entry[1]
+
+    revoked = (
+        db.query(AuthSession.id)
+        .filter(AuthSession.family_id == family_id, AuthSession.revoked_at.isnot(None))
+        .first()
+        is not None
+    )
+    _remember_family(family_id, revoked)
+    return revoked
+
+
+def revoke_session(db: Session, token: str) -> None:
+    session = db.query(AuthSession).filter(AuthSession.token_hash == _token_hash(token)).first()
+    if session is not None:
+        revoke_family(db, session.family_id)
+
+
+def revoke_family(db: Session, family_id: str) -> None:
+    _revoke_family(db, family_id, datetime.utcnow())
+    db.commit()
+    _remember_family(family_id, True)
+
+
+def revoke_user_sessions(db: Session, user_id: int) -> None:
+    family_ids = [
+        family_id
+        for (family_id,) in db.query(AuthSession.family_id)
+        .filter(AuthSession.user_id == user_id, AuthSession.revoked_at.is_(None))
+        .distinct()
+    ]
+    db.query(AuthSession).filter(AuthSession.user_id == user_id, AuthSession.revoked_at.is_(None)).update(
+        {AuthSession.revoked_at: datetime.utcnow()}, synchronize_session=False
+    )
+    db.commit()
+    for family_id in family_ids:
+        _remember_family(family_id, True)
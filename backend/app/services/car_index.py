@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.models import Car
+from app.services.assistant_context import scope_version
+from app.services.signal_matcher import LiteralMatcher
+
+# Brand/model/VIN names of the cars in one scope (a user's own cars, or every car for
+# privileged users), kept per worker while the scope's context version matches.
+# Only used to match names; callers confirm the car and pick a scope's only car from
+# the database, since another worker may have added or removed cars meanwhile.
+CAR_INDEX_CACHE_SIZE = int(os.getenv("ASSISTANT_CAR_INDEX_CACHE_SIZE", "1024"))
+CAR_INDEX_TTL_SECONDS = float(os.getenv("ASSISTANT_CAR_INDEX_TTL_SECONDS", "300"))
+
+CAR_NAME_FIELDS = ("brand", "model", "vin")
+
+_indexes: "OrderedDict[int | None, tuple[int, float, CarNameIndex]]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+class CarNameIndex:
+    def __init__(self, rows: list[tuple[int, str | None, str | None, str | None]]):
+        # Rows come in id order, so the first car recorded for a name is the one a
+        # scan over the scope would have returned.
+        self._first_car: dict[str, dict[str, int]] = {}
+        for car_id, *values in rows:
+            for field, value in zip(CAR_NAME_FIELDS, values):
+                name = (value or "").strip().lower()
+                if name:
+                    self._first_car.setdefault(name, {}).setdefault(field, car_id)
+        self._matcher = LiteralMatcher(self._first_car)
+
+    def find(self, text: str, fields: tuple[str, ...] = CAR_NAME_FIELDS) -> int | None:
+        best: int | None = None
+        for name in self._matcher.find_all(text.lower()):
+            for field, car_id in self._first_car[name].items():
+                if field in fields and (best is None or car_id < best):
+                    best = car_id
+        return best
+
+
+def _build_index(db: Session, owner_id: int | None) -> CarNameIndex:
+    query = db.query(Car.id, Car.brand, Car.model, Car.vin)
+    if owner_id is not None:
+        query = query.filter(Car.owner_id == owner_id)
+    return CarNameIndex(query.order_by(Car.id.asc()).all())
+
+
+def get_car_index(db: Session, owner_id: int | None) -> CarNameIndex:
+    # owner_id=None indexes every car.
+    version = scope_version(owner_id)
+    with _indexes_lock:
+        entry = _indexes.get(owner_id)
+        if entry is not None and entry[0] == version and time.monotonic() - entry[1] < CAR_INDEX_TTL_SECONDS:
+            _indexes.move_to_end(owner_id)
+            metrics.increment("assistant.car_index.hits")
+            return entry[2]
+
+    metrics.increment("assistant.car_index.misses")
+    # The version is read before the build, so an index built across a concurrent
+    # write fails the next version check.
+    index = _build_index(db, owner_id)
+    with _indexes_lock:
+        _indexes[owner_id] = (version, time.monotonic(), index)
+        _indexes.move_to_end(owner_id)
+        while len(_indexes) > CAR_INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+from typing import Any, AsyncIterator
+
+import httpx
+
+# Overridable so a local fake server can stand in for the real provider.
+GEMINI_API_BASE_URL = os.getenv("GEMINI_API_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_CONNECT_TIMEOUT_SECONDS = float(os.getenv("GEMINI_CONNECT_TIMEOUT_SECONDS", "5"))
+GEMINI_DISCOVERY_TIMEOUT_SECONDS = float(os.getenv("GEMINI_DISCOVERY_TIMEOUT_SECONDS", "20"))
+GEMINI_GENERATE_TIMEOUT_SECONDS = float(os.getenv("GEMINI_GENERATE_TIMEOUT_SECONDS", "40"))
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "100"))
+GEMINI_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("GEMINI_KEEPALIVE_EXPIRY_SECONDS", "60"))
+# Retries cover connection setup failures only; HTTP errors are handled by the caller.
+GEMINI_CONNECT_RETRIES = int(os.getenv("GEMINI_CONNECT_RETRIES", "2"))
+
+
+class GeminiAPIError(Exception):
+    def __init__(self, status_code: int, details: str):
+        super().__init__(f"Gemini API returned HTTP {status_code}")
+        self.status_code = status_code
+        self.details = details
+
+
+def _timeout(read_timeout: float) -> httpx.Timeout:
+    return httpx.Timeout(read_timeout, connect=GEMINI_CONNECT_TIMEOUT_SECONDS)
+
+
+def _limits(max_connections: int) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def _encode_json(payload: dict[str, Any]) -> bytes:
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def _decode_response(response: httpx.Response) -> dict[str, Any]:
+    if response.status_code >= 400:
+        raise GeminiAPIError(response.status_code, response.text)
+    data = response.json()
+    return data if isinstance(data, dict) else {}
+
+
+class GeminiClient:
+    def __init__(
+        self,
+        base_url: str = GEMINI_API_BASE_URL,
+        max_connections: int = GEMINI_MAX_CONNECTIONS,
+        retries: int = GEMINI_CONNECT_RETRIES,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self._client = httpx.Client(
+            base_url=self.base_url,
+            timeout=_timeout(GEMINI_GENERATE_TIMEOUT_SECONDS),
+            transport=httpx.HTTPTransport(retries=retries, limits=_limits(max_connections)),
+            headers={"Content-Type": "application/json"},
+        )
+
+    def list_models(self, api_key: str) -> dict[str, Any]:
+        response = self._client.get(
+            "/models",
+            params={"key": api_key},
+            timeout=_timeout(GEMINI_DISCOVERY_TIMEOUT_SECONDS),
+        )
+        return _decode_response(response)
+
+    def generate_content(self, api_key: str, model_name: str, body: dict[str, Any]) -> dict[str, Any]:
+        response = self._client.post(
+            f"/models/{model_name}:generateContent",
+            params={"key": api_key},
+            content=_encode_json(body),
+        )
+        return _decode_response(response)
+
+    def close(self) -> None:
+        self._client.close()
+
+
+class AsyncGeminiClient:
+    def __init__(
+        self,
+        base_url: str = GEMINI_API_BASE_URL,
+        max_connections: int = GEMINI_MAX_CONNECTIONS,
+        retries: int = GEMINI_CONNECT_RETRIES,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=_timeout(GEMINI_GENERATE_TIMEOUT_SECONDS),
+            transport=httpx.AsyncHTTPTransport(retries=retries, limits=_limits(max_connections)),
+            headers={"Content-Type": "application/json"},
+        )
+
+    async def list_models(self, api_key: str) -> dict[str, Any]:
+        response = await self._client.get(
+            "/models",
+            params={"key": api_key},
+            timeout=_timeout(GEMINI_DISCOVERY_TIMEOUT_SECONDS),
+        )
+        return _decode_response(response)
+
+    async def generate_content(self, api_key: str, model_name: str, body: dict[str, Any]) -> dict[str, Any]:
+        response = await self._client.post(
+            f"/models/{model_name}:generateContent",
+            params={"key": api_key},
+            content=_encode_json(body),
+        )
+        return _decode_response(response)
+
+    async def stream_generate_content(self, api_key: str, model_name: str, body: dict[str, Any]) -> AsyncIterator[dict[str, Any]]:
+        async with self._client.stream(
+            "POST",
+            f"/models/{model_name}:streamGenerateContent",
+            params={"key": api_key, "alt": "sse"},
+            content=_encode_json(body),
+        ) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                raise GeminiAPIError(response.status_code, response.text)
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if not payload:
+                    continue
+                chunk = json.loads(payload)
+                if isinstance(chunk, dict):
+                    yield chunk
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+_client: GeminiClient | None = None
+_async_client: AsyncGeminiClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_gemini_client() -> GeminiClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GeminiClient()
+    return _client
+
+
+def get_async_gemini_client() -> AsyncGeminiClient:
+    # The async client is bound to the event loop that first uses it (the app loop).
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncGeminiClient()
+    return _async_client
+
+
+async def close_gemini_clients() -> None:
+    global _client, _async_client
+    with _client_lock:
+        client, async_client = _client, _async_client
+        _client, _async_client = None, None
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        await async_client.aclose()
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Iterator
+
+from app.core import metrics
+
+# Outbound Gemini calls are admitted per turn. Concurrency caps apply per user, per API
+# key and per process; token buckets cap the sustained rate per user and per key. A turn
+# that cannot be admitted within the queue timeout is answered by the rule-based planner.
+LLM_GLOBAL_CONCURRENCY = int(os.getenv("LLM_GLOBAL_CONCURRENCY", "32"))
+LLM_USER_CONCURRENCY = int(os.getenv("LLM_USER_CONCURRENCY", "2"))
+LLM_KEY_CONCURRENCY = int(os.getenv("LLM_KEY_CONCURRENCY", "8"))
+LLM_USER_RATE_PER_MINUTE = float(os.getenv("LLM_USER_RATE_PER_MINUTE", "20"))
+LLM_USER_BURST = int(os.getenv("LLM_USER_BURST", "5"))
+LLM_KEY_RATE_PER_MINUTE = float(os.getenv("LLM_KEY_RATE_PER_MINUTE", "60"))
+LLM_KEY_BURST = int(os.getenv("LLM_KEY_BURST", "10"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "3"))
+LLM_LIMITS_MAX_ENTRIES = int(os.getenv("LLM_LIMITS_MAX_ENTRIES", "4096"))
+
+_ASYNC_POLL_SECONDS = 0.05
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, tokens: float, updated_at: float):
+        self.tokens = tokens
+        self.updated_at = updated_at
+
+
+class LLMLimiter:
+    def __init__(
+        self,
+        global_concurrency: int = LLM_GLOBAL_CONCURRENCY,
+        user_concurrency: int = LLM_USER_CONCURRENCY,
+        key_concurrency: int = LLM_KEY_CONCURRENCY,
+        user_rate_per_minute: float = LLM_USER_RATE_PER_MINUTE,
+        user_burst: int = LLM_USER_BURST,
+        key_rate_per_minute: float = LLM_KEY_RATE_PER_MINUTE,
+        key_burst: int = LLM_KEY_BURST,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT_SECONDS,
+        max_entries: int = LLM_LIMITS_MAX_ENTRIES,
+    ):
+        self.concurrency = {"global": global_concurrency, "user": user_concurrency, "key": key_concurrency}
+        self.rates = {"user": (user_rate_per_minute / 60, user_burst), "key": (key_rate_per_minute / 60, key_burst)}
+        self.queue_timeout = queue_timeout
+        self.max_entries = max_entries
+        self._buckets: "OrderedDict[tuple[str, str], _Bucket]" = OrderedDict()
+        self._in_flight: dict[tuple[str, str], int] = {}
+        self._cond = threading.Condition()
+
+    def _scopes(self, user_id: Any, key_fingerprint: str) -> list[tuple[str, str]]:
+        return [("global", ""), ("user", str(user_id)), ("key", key_fingerprint)]
+
+    def _bucket(self, scope: tuple[str, str], now: float) -> _Bucket:
+        rate, burst = self.rates[scope[0]]
+        bucket = self._buckets.get(scope)
+        if bucket is None:
+            bucket = _Bucket(float(burst), now)
+            self._buckets[scope] = bucket
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(scope)
+            bucket.tokens = min(float(burst), bucket.tokens + (now - bucket.updated_at) * rate)
+            bucket.updated_at = now
+        return bucket
+
+    def _try_admit(self, scopes: list[tuple[str, str]]) -> tuple[str | None, float]:
+        # Returns (None, 0) once admitted, otherwise the limiting scope and how long
+        # until a rate token frees up (0 when waiting on a concurrency slot).
+        # Caller holds self._cond.
+        for scope in scopes:
+            limit = self.concurrency[scope[0]]
+            if limit > 0 and self._in_flight.get(scope, 0) >= limit:
+                return f"{scope[0]}_concurrency", 0.0
+
+        now = time.monotonic()
+        buckets = [(scope, self._bucket(scope, now)) for scope in scopes if scope[0] in self.rates and self.rates[scope[0]][0] > 0]
+        for scope, bucket in buckets:
+            if bucket.tokens < 1:
+                rate = self.rates[scope[0]][0]
+                return f"{scope[0]}_rate", (1 - bucket.tokens) / rate
+
+        for _, bucket in buckets:
+            bucket.tokens -= 1
+        for scope in scopes:
+            self._in_flight[scope] = self._in_flight.get(scope, 0) + 1
+        metrics.set_gauge("assistant.llm.in_flight", self._in_flight[scopes[0]])
+        return None, 0.0
+
+    def _release(self, scopes: list[tuple[str, str]]) -> None:
+        with self._cond:
+            for scope in scopes:
+                remaining = self._in_flight.get(scope, 0) - 1
+                if remaining > 0 or scope[0] == "global":
+                    self._in_flight[scope] = max(0, remaining)
+                else:
+                    self._in_flight.pop(scope, None)
+            metrics.set_gauge("assistant.llm.in_flight", self._in_flight.get(scopes[0], 0))
+            self._cond.notify_all()
+
+    def _record(self, started: float, reason: str | None) -> None:
+        metrics.observe("assistant.llm.queue_wait", time.monotonic() - started)
+        if reason is None:
+            metrics.increment("assistant.llm.admitted")
+        else:
+            metrics.increment(f"assistant.llm.rejected.{reason}")
+
+    def acquire(self, user_id: Any, key_fingerprint: str) -> list[tuple[str, str]] | None:
+        scopes = self._scopes(user_id, key_fingerprint)
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        with self._cond:
+            while True:
+                reason, wait = self._try_admit(scopes)
+                remaining = deadline - time.monotonic()
+                if reason is None or remaining <= 0 or wait > remaining:
+                    break
+                self._cond.wait(wait or remaining)
+        self._record(started, reason)
+        return scopes if reason is None else None
+
+    async def acquire_async(self, user_id: Any, key_fingerprint: str) -> list[tuple[str, str]] | None:
+        # Same admission as acquire() without parking an event loop thread on the condition.
+        scopes = self._scopes(user_id, key_fingerprint)
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        while True:
+            with self._cond:
+                reason, wait = self._try_admit(scopes)
+            remaining = deadline - time.monotonic()
+            if reason is None or remaining <= 0 or wait > remaining:
+                break
+            await asyncio.sleep(min(wait or _ASYNC_POLL_SECONDS, remaining))
+        self._record(started, reason)
+        return scopes if reason is None else None
+
+    @contextmanager
+    def slot(self, user_id: Any, key_fingerprint: str) -> Iterator[bool]:
+        scopes = self.acquire(user_id, key_fingerprint)
+        try:
+            yield scopes is not None
+        finally:
+            if scopes is not None:
+                self._release(scopes)
+
+    @asynccontextmanager
+    async def slot_async(self, user_id: Any, key_fingerprint: str) -> AsyncIterator[bool]:
+        scopes = await self.acquire_async(user_id, key_fingerprint)
+        try:
+            yield scopes is not None
+        finally:
+            if scopes is not None:
+                self._release(scopes)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._cond:
+            in_flight = dict(self._in_flight)
+        return {
+            "in_flight": in_flight.get(("global", ""), 0),
+            "users_in_flight": sum(1 for scope in in_flight if scope[0] == "user"),
+            "keys_in_flight": sum(1 for scope in in_flight if scope[0] == "key"),
+            "limits": {
+                "concurrency": dict(self.concurrency),
+                "rate_per_minute": {scope: rate * 60 for scope, (rate, _) in self.rates.items()},
+                "queue_timeout_seconds": self.queue_timeout,
+            },
+        }
+
+
+llm_limiter = LLMLimiter()
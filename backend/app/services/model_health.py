@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+# Overload (429/503) opens a circuit after repeated failures and cools down fast;
+# "model unavailable" (404, unsupported capability) opens at once for much longer.
+MODEL_FAILURE_THRESHOLD = int(os.getenv("GEMINI_MODEL_FAILURE_THRESHOLD", "3"))
+MODEL_OVERLOAD_COOLDOWN_SECONDS = float(os.getenv("GEMINI_MODEL_OVERLOAD_COOLDOWN_SECONDS", "30"))
+MODEL_UNAVAILABLE_COOLDOWN_SECONDS = float(os.getenv("GEMINI_MODEL_UNAVAILABLE_COOLDOWN_SECONDS", "3600"))
+MODEL_HEALTH_MAX_ENTRIES = int(os.getenv("GEMINI_MODEL_HEALTH_MAX_ENTRIES", "4096"))
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class _ModelHealth:
+    __slots__ = ("state", "failures", "opened_at", "cooldown", "probe_started_at", "last_failure_at", "overloaded")
+
+    def __init__(self):
+        self.state = CIRCUIT_CLOSED
+        # Why the circuit last opened: overload (429/503) or model unavailable.
+        self.overloaded = False
+        self.failures = 0
+        self.opened_at = 0.0
+        self.cooldown = 0.0
+        self.probe_started_at = 0.0
+        self.last_failure_at = 0.0
+
+
+class ModelHealthRegistry:
+    def __init__(
+        self,
+        failure_threshold: int = MODEL_FAILURE_THRESHOLD,
+        overload_cooldown: float = MODEL_OVERLOAD_COOLDOWN_SECONDS,
+        unavailable_cooldown: float = MODEL_UNAVAILABLE_COOLDOWN_SECONDS,
+        max_entries: int = MODEL_HEALTH_MAX_ENTRIES,
+    ):
+        self.failure_threshold = failure_threshold
+        self.overload_cooldown = overload_cooldown
+        self.unavailable_cooldown = unavailable_cooldown
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple[str, str], _ModelHealth]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, key_fingerprint: str, model_name: str) -> _ModelHealth:
+        key = (key_fingerprint, model_name)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = _ModelHealth()
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+        return entry
+
+    def order_candidates(self, key_fingerprint: str, candidates: list[str]) -> list[str]:
+        # Healthy models keep their preference order; a model whose cooldown has
+        # elapsed is let through once as a half-open probe; open circuits are skipped.
+        now = time.monotonic()
+        healthy: list[str] = []
+        probes: list[str] = []
+        with self._lock:
+            for model_name in candidates:
+                entry = self._entries.get((key_fingerprint, model_name))
+                if entry is None or entry.state == CIRCUIT_CLOSED:
+                    healthy.append(model_name)
+                    continue
+                if now - entry.opened_at < entry.cooldown:
+                    continue
+                # A probe that never reported back is retried after another cooldown.
+                if entry.state == CIRCUIT_HALF_OPEN and now - entry.probe_started_at < entry.cooldown:
+                    continue
+                entry.state = CIRCUIT_HALF_OPEN
+                entry.probe_started_at = now
+                probes.append(model_name)
+        return healthy + probes
+
+    def release_probes(self, key_fingerprint: str, model_names: list[str]) -> None:
+        # Probe slots handed out by order_candidates but not called (an earlier
+        # candidate answered) become available to the next request right away.
+        with self._lock:
+            for model_name in model_names:
+                entry = self._entries.get((key_fingerprint, model_name))
+                if entry is not None and entry.state == CIRCUIT_HALF_OPEN:
+                    entry.state = CIRCUIT_OPEN
+                    entry.probe_started_at = 0.0
+
+    def blocked_reason(self, key_fingerprint: str, candidates: list[str]) -> str | None:
+        # For a request that found no callable candidate: "overloaded" if any circuit
+        # is open because of overload, "unavailable" if they are all open for 404s.
+        with self._lock:
+            entries = [self._entries.get((key_fingerprint, model_name)) for model_name in candidates]
+        blocked = [entry for entry in entries if entry is not None and entry.state != CIRCUIT_CLOSED]
+        if not blocked:
+            return None
+        return "overloaded" if any(entry.overloaded for entry in blocked) else "unavailable"
+
+    def record_success(self, key_fingerprint: str, model_name: str) -> None:
+        with self._lock:
+            entry = self._entries.get((key_fingerprint, model_name))
+            if entry is not None:
+                entry.state = CIRCUIT_CLOSED
+                entry.failures = 0
+
+    def record_failure(self, key_fingerprint: str, model_name: str, overloaded: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entry(key_fingerprint, model_name)
+            entry.failures += 1
+            entry.last_failure_at = now
+            if not overloaded:
+                cooldown = self.unavailable_cooldown
+            elif entry.state == CIRCUIT_HALF_OPEN or entry.failures >= self.failure_threshold:
+                cooldown = self.overload_cooldown
+            else:
+                return
+            entry.state = CIRCUIT_OPEN
+            entry.opened_at = now
+            entry.cooldown = cooldown
+            entry.overloaded = overloaded
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "key": key_fingerprint[:12],
+                    "model": model_name,
+                    "state": entry.state,
+                    "failures": entry.failures,
+                    "retry_in_seconds": max(0.0, round(entry.opened_at + entry.cooldown - now, 1))
+                    if entry.state != CIRCUIT_CLOSED
+                    else 0.0,
+                }
+                for (key_fingerprint, model_name), entry in self._entries.items()
+            ]
+
+
+model_health = ModelHealthRegistry()
@@ -0,0 +1,84 @@
+import copy
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from app.core import metrics
+from app.models import User
+from app.services.assistant_context import context_version
+
+PLAN_CACHE_SIZE = int(os.getenv("ASSISTANT_PLAN_CACHE_SIZE", "2048"))
+PLAN_CACHE_TTL_SECONDS = float(os.getenv("ASSISTANT_PLAN_CACHE_TTL_SECONDS", "3600"))
+PLAN_CACHE_MODEL = "plan-cache"
+
+# Only plans that the backend turns into an exact answer from the DB and that do
+# not depend on earlier turns (car/order references, dates) are safe to reuse.
+CACHEABLE_INTENTS = {
+    "count_entities",
+    "list_cars",
+    "list_orders",
+    "list_invoices",
+    "list_damage_reports",
+    "list_service_book",
+    "list_maintenance_rules",
+    "sum_paid_invoices",
+    "show_capabilities",
+    "get_price",
+}
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_message(text: str) -> str:
+    normalized = _WHITESPACE_PATTERN.sub(" ", text.lower().replace("ё", "е")).strip()
+    return normalized.strip(" ?!.,;:")
+
+
+def plan_cache_key(current_user: User, message: str) -> tuple:
+    return (current_user.id, current_user.role, normalize_message(message), context_version(current_user))
+
+
+class PlanCache:
+    def __init__(self, max_size: int = PLAN_CACHE_SIZE, ttl_seconds: float = PLAN_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[tuple, tuple[float, dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] >= self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None:
+            metrics.increment("assistant.plan_cache.misses")
+            return None
+        metrics.increment("assistant.plan_cache.hits")
+        return copy.deepcopy(entry[1])
+
+    def put(self, key: tuple, plan: dict[str, Any]) -> None:
+        if plan.get("intent") not in CACHEABLE_INTENTS:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), copy.deepcopy(plan))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                metrics.increment("assistant.plan_cache.evictions")
+            size = len(self._entries)
+        metrics.set_gauge("assistant.plan_cache.size", size)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        metrics.set_gauge("assistant.plan_cache.size", 0)
+
+
+plan_cache = PlanCache()
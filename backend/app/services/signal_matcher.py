@@ -0,0 +1,98 @@
+import re
+from collections import deque
+
+# Pieces of regex syntax that are not required literal text: escapes such as \b or \s,
+# character classes, optional characters and quantifiers.
+_REGEX_SYNTAX = re.compile(r"\\[A-Za-z]|\[[^\]]*\][?*]?|.[?*]|\{[^}]*\}|[()|+.^$?*]|\\")
+
+
+def literal_anchor(pattern: str) -> str:
+    # Longest run of text that every match of the pattern must contain; empty when
+    # the pattern has alternation or groups and no safe anchor can be read off it.
+    if "|" in pattern or "(" in pattern:
+        return ""
+    return max(_REGEX_SYNTAX.split(pattern), key=len).lower()
+
+
+# Aho-Corasick automaton over literal strings: reports every one of them that occurs
+# in a text in a single pass over it.
+class LiteralMatcher:
+    def __init__(self, literals):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[tuple[str, ...]] = [()]
+        for literal in literals:
+            if literal:
+                self._add_literal(literal)
+        self._link_failures()
+
+    def _add_literal(self, literal: str) -> None:
+        state = 0
+        for char in literal:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+                next_state = len(self._goto) - 1
+                self._goto[state][char] = next_state
+            state = next_state
+        if literal not in self._output[state]:
+            self._output[state] = self._output[state] + (literal,)
+
+    def _link_failures(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text: str) -> set[str]:
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+
+        found: set[str] = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+# Finds which named signals (tuples of regex patterns) occur in a text in one pass.
+# The literal anchors of all patterns form an Aho-Corasick automaton; a pattern is
+# only run when its anchor occurs in the text, so results match searching them all.
+class SignalMatcher:
+    def __init__(self, signals: dict[str, tuple[str, ...]]):
+        self._unanchored: list[tuple[str, re.Pattern]] = []
+        self._rules: dict[str, list[tuple[str, re.Pattern]]] = {}
+        for name, patterns in signals.items():
+            for pattern in patterns:
+                compiled = re.compile(pattern, flags=re.IGNORECASE)
+                anchor = literal_anchor(pattern)
+                if anchor:
+                    self._rules.setdefault(anchor, []).append((name, compiled))
+                else:
+                    self._unanchored.append((name, compiled))
+        self._anchors = LiteralMatcher(self._rules)
+
+    def match(self, text: str) -> frozenset[str]:
+        lowered = text.lower()
+        anchors = self._anchors.find_all(lowered)
+
+        found: set[str] = set()
+        candidates = [rule for anchor in anchors for rule in self._rules[anchor]] + self._unanchored
+        for name, compiled in candidates:
+            if name not in found and compiled.search(lowered):
+                found.add(name)
+        return frozenset(found)
@@ -0,0 +1,82 @@
+"""Compare sync (threadpool) and async LLM calls of the assistant under concurrency.
+
+Run from backend/:
+    python -m benchmarks.assistant_concurrency --requests 200 --latency 0.5
+
+The sync path is limited by the 40-thread pool Starlette uses for sync routes;
+the probe column shows how long an unrelated sync endpoint waits for a thread
+while the burst is in flight.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import anyio
+import anyio.to_thread
+
+from benchmarks.fake_gemini import start_fake_gemini
+
+THREADPOOL_SIZE = 40
+
+
+def _report(label: str, started: float, finished: float, requests: int, latency: float, probe: float) -> None:
+    elapsed = finished - started
+    print(
+        f"{label:<6} requests={requests} wall={elapsed:.2f}s "
+        f"throughput={requests / elapsed:.1f} req/s "
+        f"effective_concurrency={requests * latency / elapsed:.1f} "
+        f"probe_wait={probe * 1000:.0f}ms"
+    )
+
+
+async def _probe(limiter: anyio.CapacityLimiter) -> float:
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    await anyio.to_thread.run_sync(lambda: None, limiter=limiter)
+    return time.perf_counter() - started
+
+
+async def run_sync_path(service, requests: int, latency: float) -> None:
+    limiter = anyio.CapacityLimiter(THREADPOOL_SIZE)
+
+    def call():
+        return service._build_model_response("bench-key", "system", [], "сколько у меня машин")
+
+    started = time.perf_counter()
+    probe_task = asyncio.ensure_future(_probe(limiter))
+    await asyncio.gather(*(anyio.to_thread.run_sync(call, limiter=limiter) for _ in range(requests)))
+    finished = time.perf_counter()
+    _report("sync", started, finished, requests, latency, await probe_task)
+
+
+async def run_async_path(service, requests: int, latency: float) -> None:
+    limiter = anyio.CapacityLimiter(THREADPOOL_SIZE)
+
+    started = time.perf_counter()
+    probe_task = asyncio.ensure_future(_probe(limiter))
+    await asyncio.gather(
+        *(service._build_model_response_async("bench-key", "system", [], "сколько у меня машин") for _ in range(requests))
+    )
+    finished = time.perf_counter()
+    _report("async", started, finished, requests, latency, await probe_task)
+
+
+async def main(requests: int, latency: float) -> None:
+    server = start_fake_gemini(latency=latency)
+    os.environ["GEMINI_API_BASE_URL"] = server.base_url
+    os.environ.setdefault("GEMINI_MAX_CONNECTIONS", str(max(requests, 100)))
+
+    from app.services import assistant_service
+
+    await run_sync_path(assistant_service, requests, latency)
+    await run_async_path(assistant_service, requests, latency)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake provider latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.latency))
@@ -0,0 +1,68 @@
+"""Tail latency of assistant LLM calls with and without hedged requests.
+
+Run from backend/:
+    python -m benchmarks.assistant_hedging --requests 300 --slow-rate 0.1 --hedge-delay-ms 300
+
+The fake provider answers in --latency seconds, except for --slow-rate of the
+calls which take --slow-latency seconds. Percentiles come from app.core.metrics.
+"""
+import argparse
+import asyncio
+import os
+
+from benchmarks.fake_gemini import start_fake_gemini
+
+
+async def _run(service, requests: int, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call() -> None:
+        async with semaphore:
+            await service._build_model_response_async("bench-key", "system", [], "покажи счета")
+
+    await asyncio.gather(*(call() for _ in range(requests)))
+
+
+def _print_latency(label: str, summary: dict | None) -> None:
+    if not summary:
+        print(f"{label:<10} no samples")
+        return
+    print(
+        f"{label:<10} n={summary['count']} p50={summary['p50_ms']}ms "
+        f"p95={summary['p95_ms']}ms p99={summary['p99_ms']}ms max={summary['max_ms']}ms"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    server = start_fake_gemini(latency=args.latency, slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    os.environ["GEMINI_API_BASE_URL"] = server.base_url
+
+    from app.core import metrics
+    from app.services import assistant_service
+
+    assistant_service.GEMINI_HEDGE_DELAY_MS = 0
+    await _run(assistant_service, args.requests, args.concurrency)
+
+    assistant_service.GEMINI_HEDGE_DELAY_MS = args.hedge_delay_ms
+    await _run(assistant_service, args.requests, args.concurrency)
+
+    snapshot = metrics.snapshot()
+    _print_latency("baseline", snapshot["latencies"].get("assistant.llm.latency"))
+    _print_latency("hedged", snapshot["latencies"].get("assistant.llm.hedged_latency"))
+    counters = snapshot["counters"]
+    print(
+        f"hedges_launched={counters.get('assistant.llm.hedges_launched', 0)} "
+        f"hedge_wins={counters.get('assistant.llm.hedge_wins', 0)}"
+    )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--slow-rate", type=float, default=0.1)
+    parser.add_argument("--slow-latency", type=float, default=3.0)
+    parser.add_argument("--hedge-delay-ms", type=int, default=400)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,125 @@
+"""Load test for POST /assistant/chats/{id}/messages against a running API.
+
+Run from backend/, with the API pointed at the fake provider:
+    python -m benchmarks.fake_gemini --port 8090 --latency 0.3 --burst-every 30 --burst-duration 5
+    GEMINI_API_BASE_URL=http://127.0.0.1:8090/v1beta uvicorn app.main:app --port 8000
+    python -m benchmarks.assistant_load --username demo --password demo --concurrency 20 --requests 1000
+
+The user needs an AI key saved (any value works against the fake provider), or
+every turn is answered by the rule-based planner. Each worker sends messages
+in its own chat, one at a time. The chats are deleted afterwards unless
+--keep-chats is set. The report shows latency percentiles, throughput, status
+codes, and which model answered: "rule-based" marks turns answered without the
+LLM (confident rules, limits or provider failures).
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+
+MESSAGES = (
+    "Сколько у меня машин?",
+    "Покажи мои заявки",
+    "Какой пробег у моей машины?",
+    "Статус заявки ORD-1",
+    "Что ты умеешь?",
+    "Запиши меня на диагностику завтра в 10:00",
+    "У меня стучит подвеска при повороте направо, что это может быть?",
+    "Сколько я заплатил по счетам?",
+    "Посоветуй, когда менять масло при пробеге 90 000 км",
+    "Какие регламенты ТО есть для моей машины?",
+)
+
+
+def _percentile(sorted_values: list[float], quantile: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, int(round(quantile * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+async def _login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post("/auth/login", data={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def _worker(
+    client: httpx.AsyncClient,
+    chat_id: str,
+    worker_index: int,
+    remaining: list[int],
+    args: argparse.Namespace,
+    latencies: list[float],
+    statuses: Counter,
+    models: Counter,
+) -> None:
+    sent = 0
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        message = MESSAGES[(worker_index + sent) % len(MESSAGES)]
+        sent += 1
+        started = time.perf_counter()
+        try:
+            response = await client.post(
+                f"/assistant/chats/{chat_id}/messages",
+                params={"delta": "true"} if args.delta else None,
+                json={"message": message},
+            )
+        except httpx.HTTPError as error:
+            statuses[type(error).__name__] += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+        statuses[response.status_code] += 1
+        if response.status_code == 200:
+            models[response.json().get("model", "?")] += 1
+
+
+async def main(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=args.concurrency + 4, max_keepalive_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        token = await _login(client, args.username, args.password)
+        client.headers["Authorization"] = f"Bearer {token}"
+
+        chat_ids = []
+        for index in range(args.concurrency):
+            response = await client.post("/assistant/chats", json={"title": f"load test {index + 1}"})
+            response.raise_for_status()
+            chat_ids.append(response.json()["id"])
+
+        latencies: list[float] = []
+        statuses: Counter = Counter()
+        models: Counter = Counter()
+        remaining = [args.requests]
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(_worker(client, chat_id, index, remaining, args, latencies, statuses, models) for index, chat_id in enumerate(chat_ids))
+        )
+        elapsed = time.perf_counter() - started
+
+        if not args.keep_chats:
+            await asyncio.gather(*(client.delete(f"/assistant/chats/{chat_id}") for chat_id in chat_ids))
+
+    completed = sum(statuses.values())
+    print(f"requests={completed} concurrency={args.concurrency} wall={elapsed:.2f}s throughput={completed / elapsed:.1f} req/s")
+    if latencies:
+        ordered = sorted(latencies)
+        print(
+            f"latency p50={_percentile(ordered, 0.50) * 1000:.0f}ms p95={_percentile(ordered, 0.95) * 1000:.0f}ms "
+            f"p99={_percentile(ordered, 0.99) * 1000:.0f}ms max={ordered[-1] * 1000:.0f}ms"
+        )
+    print("status " + " ".join(f"{status}={count}" for status, count in sorted(statuses.items(), key=str)))
+    print("model  " + " ".join(f"{model}={count}" for model, count in models.most_common()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500, help="total messages across all workers")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--delta", action="store_true", help="use the delta response mode")
+    parser.add_argument("--keep-chats", action="store_true")
+    asyncio.run(main(parser.parse_args()))
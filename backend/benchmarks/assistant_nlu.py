@@ -0,0 +1,140 @@
+"""Rule-based NLU: per-pattern re.search scans vs the Aho-Corasick signal matcher.
+
+Run from backend/:
+    python -m benchmarks.assistant_nlu --rounds 2000
+
+Both sides extract every signal the rule-based planner looks at (entities, car
+attribute, count/list/help questions, booking and damage tokens). The legacy
+side reproduces the scans the planner used to run; results are checked for
+equality on the whole corpus before timing. The matcher's per-message cache is
+bypassed so every call does a full scan.
+"""
+import argparse
+import re
+import time
+
+from app.services import assistant_service as service
+
+CORPUS = (
+    "Сколько у меня машин?",
+    "сколько машин и заявок",
+    "колько счетов у меня",
+    "Покажи мои машины",
+    "покажи мне список заявок",
+    "Какие у меня счета?",
+    "перечисли повреждения",
+    "что есть в сервисной книжке",
+    "что у меня в журнале обслуживания",
+    "Покажи регламенты обслуживания",
+    "какие правила ТО для моей машины",
+    "Какой пробег у BMW X5?",
+    "какой vin у моей тойоты",
+    "Какого года мой автомобиль",
+    "марка и модель машины",
+    "Что ты умеешь?",
+    "помощь",
+    "какие у тебя возможности",
+    "как называется сервис",
+    "Статус заявки ORD-15",
+    "заявка ord-7 готова?",
+    "Запиши меня на замену масла завтра в 10:00",
+    "записать на диагностику послезавтра",
+    "создай запись на шиномонтаж в пятницу",
+    "запланируй ТО на 15 мая",
+    "Создай заявку на повреждение: царапина на двери",
+    "оформи вмятина на капоте",
+    "добавь скол на лобовом",
+    "Сколько стоит замена колодок?",
+    "сколько я заплатил по счетам",
+    "количество записей сервиса",
+    "число регламентов",
+    "count cars",
+    "show my invoices",
+    "maintenance rules list",
+    "привет",
+    "спасибо, всё понятно",
+    "в 15:30",
+    "на завтра утром",
+    "У меня стучит подвеска при повороте направо, что это может быть?",
+)
+
+LEGACY_HELP_TOKENS = ("что ты умеешь", "что можешь", "помощь", "возможности", "что доступно", "что я могу сделать")
+LEGACY_SERVICE_NAME_TOKENS = ("как сервис называется", "название сервиса", "как называется сервис", "имя сервиса")
+LEGACY_STATUS_TOKENS = ("статус заявки", "статус заказа", "заявка ord-", "заказ ord-")
+LEGACY_BOOKING_TOKENS = ("запиши", "записать", "запись", "запланируй", "создай запись")
+LEGACY_DAMAGE_ACTION_TOKENS = ("создай", "оформи", "открой", "заведи", "добавь")
+LEGACY_DAMAGE_KIND_TOKENS = ("поврежден", "повреждение", "вмятина", "царапина", "трещина", "скол")
+
+
+def _legacy_match_any(text: str, patterns: tuple[str, ...]) -> bool:
+    return any(re.search(pattern, text, flags=re.IGNORECASE) for pattern in patterns)
+
+
+def legacy_signals(text: str) -> dict:
+    lowered = text.lower()
+    count = any(token in lowered for token in service.COUNT_REQUEST_TOKENS) or any(
+        re.search(pattern, lowered, flags=re.IGNORECASE) for pattern in service.COUNT_REQUEST_PATTERNS
+    )
+    attribute = None
+    for name, patterns in service.CAR_ATTRIBUTE_PATTERNS.items():
+        if _legacy_match_any(text.lower(), patterns):
+            attribute = name
+            break
+    return {
+        "entities": [entity for entity, patterns in service.ENTITY_PATTERNS.items() if _legacy_match_any(text, patterns)],
+        "attribute": attribute,
+        "count": count,
+        "list": any(token in text.lower() for token in service.LIST_REQUEST_TOKENS),
+        "help": any(token in text.lower() for token in LEGACY_HELP_TOKENS),
+        "service_name": any(token in lowered for token in LEGACY_SERVICE_NAME_TOKENS),
+        "booking_status": any(token in lowered for token in LEGACY_STATUS_TOKENS),
+        "booking": any(token in lowered for token in LEGACY_BOOKING_TOKENS),
+        "damage": any(token in lowered for token in LEGACY_DAMAGE_ACTION_TOKENS)
+        and any(token in lowered for token in LEGACY_DAMAGE_KIND_TOKENS),
+    }
+
+
+def matcher_signals(text: str) -> dict:
+    signals = service._message_signals.__wrapped__(text)
+    attribute = next((name for name in service.CAR_ATTRIBUTE_PATTERNS if f"attribute_{name}" in signals), None)
+    return {
+        "entities": [entity for entity in service.ENTITY_PATTERNS if f"entity_{entity}" in signals],
+        "attribute": attribute,
+        "count": "count" in signals,
+        "list": "list" in signals,
+        "help": "help" in signals,
+        "service_name": "service_name" in signals,
+        "booking_status": "booking_status" in signals,
+        "booking": "booking" in signals,
+        "damage": "damage_action" in signals and "damage_kind" in signals,
+    }
+
+
+def _time(label: str, extract, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for text in CORPUS:
+            extract(text)
+    elapsed = time.perf_counter() - started
+    per_message = elapsed / (rounds * len(CORPUS)) * 1_000_000
+    print(f"{label:<9} total={elapsed:.3f}s per_message={per_message:.1f}us")
+    return elapsed
+
+
+def main(args: argparse.Namespace) -> None:
+    mismatches = [text for text in CORPUS if legacy_signals(text) != matcher_signals(text)]
+    for text in mismatches:
+        print(f"MISMATCH {text!r}: legacy={legacy_signals(text)} matcher={matcher_signals(text)}")
+    if mismatches:
+        raise SystemExit(1)
+    print(f"corpus={len(CORPUS)} messages, signals identical")
+
+    legacy = _time("legacy", legacy_signals, args.rounds)
+    matcher = _time("matcher", matcher_signals, args.rounds)
+    print(f"speedup={legacy / matcher:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=2000)
+    main(parser.parse_args())
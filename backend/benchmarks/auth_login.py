@@ -0,0 +1,111 @@
+"""Latency of other endpoints while POST /auth/login handles a burst of sign-ins.
+
+Run from backend/ against a running API, once per password hashing mode:
+    PASSWORD_POOL_WORKERS=0 uvicorn app.main:app --port 8000
+    python -m benchmarks.auth_login --username demo --password demo --logins 400 --concurrency 50
+    PASSWORD_POOL_WORKERS=4 uvicorn app.main:app --port 8000
+    python -m benchmarks.auth_login --username demo --password demo --logins 400 --concurrency 50
+
+A probe requests --probe-path every --probe-interval seconds, first with the API
+idle and then during the burst; compare the two latency lines between runs. With
+PASSWORD_POOL_WORKERS=0 every login runs bcrypt in the request threadpool, so
+sync endpoints queue behind it. Logins answered 503 were refused by the password
+pool's PASSWORD_POOL_MAX_PENDING cap.
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+
+
+def _percentile(sorted_values: list[float], quantile: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, int(round(quantile * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def _report(label: str, latencies: list[float]) -> None:
+    if not latencies:
+        print(f"{label:<12} no samples")
+        return
+    ordered = sorted(latencies)
+    print(
+        f"{label:<12} n={len(ordered)} p50={_percentile(ordered, 0.50) * 1000:.1f}ms "
+        f"p95={_percentile(ordered, 0.95) * 1000:.1f}ms p99={_percentile(ordered, 0.99) * 1000:.1f}ms "
+        f"max={ordered[-1] * 1000:.1f}ms"
+    )
+
+
+async def _probe(client: httpx.AsyncClient, args: argparse.Namespace, stop: asyncio.Event, latencies: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get(args.probe_path)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=args.probe_interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _login_worker(client: httpx.AsyncClient, args: argparse.Namespace, remaining: list[int], latencies: list[float], statuses: Counter) -> None:
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        started = time.perf_counter()
+        try:
+            response = await client.post("/auth/login", data={"username": args.username, "password": args.password})
+        except httpx.HTTPError as error:
+            statuses[type(error).__name__] += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+        statuses[response.status_code] += 1
+
+
+async def main(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=args.concurrency + 4, max_keepalive_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client, \
+            httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as probe_client:
+        response = await client.post("/auth/login", data={"username": args.username, "password": args.password})
+        response.raise_for_status()
+        probe_client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        idle: list[float] = []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe(probe_client, args, stop, idle))
+        await asyncio.sleep(args.idle_seconds)
+        stop.set()
+        await probe
+
+        during: list[float] = []
+        login_latencies: list[float] = []
+        statuses: Counter = Counter()
+        remaining = [args.logins]
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe(probe_client, args, stop, during))
+        started = time.perf_counter()
+        await asyncio.gather(*(_login_worker(client, args, remaining, login_latencies, statuses) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+
+    completed = sum(statuses.values())
+    print(f"logins={completed} concurrency={args.concurrency} wall={elapsed:.2f}s throughput={completed / elapsed:.1f} logins/s")
+    print("status " + " ".join(f"{status}={count}" for status, count in sorted(statuses.items(), key=str)))
+    _report("login", login_latencies)
+    _report("probe idle", idle)
+    _report("probe burst", during)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=400, help="total sign-ins in the burst")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--probe-path", default="/users/me", help="authenticated GET timed during the burst")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    parser.add_argument("--idle-seconds", type=float, default=3.0, help="probe duration before the burst")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    asyncio.run(main(parser.parse_args()))
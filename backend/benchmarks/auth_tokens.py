@@ -0,0 +1,62 @@
+"""Auth dependency chain per request: full JWT verification vs the verified-token cache.
+
+Run from backend/:
+    python -m benchmarks.auth_tokens --tokens 200 --requests 200000
+
+Calls the same functions FastAPI runs for an endpoint guarded by
+require_roles(...): bearer extraction, decode_access_token and the role check.
+Requests cycle through --tokens distinct tokens, the way many users reuse their
+own token. Roles are read through the user cache from an in-memory SQLite table,
+which stays warm for the whole run.
+"""
+import argparse
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api import auth
+from app.api.deps import require_roles
+from app.core import security
+from app.models import User
+
+
+def run(db, headers: list[str], requests: int) -> float:
+    dependency = require_roles("user", "admin")
+    started = time.perf_counter()
+    for index in range(requests):
+        principal = auth.get_current_principal(access_token=None, authorization=headers[index % len(headers)], db=db)
+        dependency(user=principal)
+    return time.perf_counter() - started
+
+
+def main(args: argparse.Namespace) -> None:
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    User.__table__.create(engine)
+    db = sessionmaker(bind=engine)()
+    db.execute(
+        insert(User),
+        [{"id": index + 1, "username": f"user{index}", "email": f"user{index}@example.com", "password_hash": "x", "role": "user"} for index in range(args.tokens)],
+    )
+    db.commit()
+    headers = [f"Bearer {security.create_access_token({'user_id': index + 1, 'role': 'user'})}" for index in range(args.tokens)]
+    configured_size = security.TOKEN_CACHE_SIZE
+
+    security.TOKEN_CACHE_SIZE = 0
+    uncached = run(db, headers, args.requests)
+    security.TOKEN_CACHE_SIZE = max(configured_size, args.tokens)
+    security._verified_tokens.clear()
+    cached = run(db, headers, args.requests)
+    security.TOKEN_CACHE_SIZE = configured_size
+
+    for label, elapsed in (("jwt.decode", uncached), ("token cache", cached)):
+        print(f"{label:<12} {elapsed / args.requests * 1e6:.1f}us/request total={elapsed:.2f}s")
+    print(f"speedup={uncached / cached:.1f}x tokens={args.tokens} requests={args.requests}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=200, help="distinct bearer tokens in rotation")
+    parser.add_argument("--requests", type=int, default=200_000)
+    main(parser.parse_args())
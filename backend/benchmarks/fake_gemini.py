@@ -0,0 +1,168 @@
+"""Local stand-in for the Gemini API (models list, generateContent, streamGenerateContent).
+
+Run from backend/ as a standalone server:
+    python -m benchmarks.fake_gemini --port 8090 --latency 0.3 --error-rate 0.02 --burst-every 30 --burst-duration 5
+
+then start the API with GEMINI_API_BASE_URL=http://127.0.0.1:8090/v1beta. Faults
+apply to generation calls only: error_rate answers 503, rate_limit_rate answers
+429 at random, and every burst_every seconds all calls get 429 for burst_duration
+seconds, the way a shared quota runs out.
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+FAKE_MODELS = ["gemini-2.0-flash", "gemini-1.5-flash-8b", "gemini-1.5-flash"]
+FAKE_PLAN = {"reply": "", "intent": "list_cars", "data": {}, "action": None}
+STREAM_CHUNK_SIZE = 16
+
+
+def _candidate(text: str) -> dict:
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+
+def _error(status_code: int, status: str, message: str) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content={"error": {"code": status_code, "status": status, "message": message}})
+
+
+async def _stream_chunks(text: str, latency: float):
+    await asyncio.sleep(latency)
+    for start in range(0, len(text), STREAM_CHUNK_SIZE):
+        yield f"data: {json.dumps(_candidate(text[start:start + STREAM_CHUNK_SIZE]), ensure_ascii=False)}\r\n\r\n"
+
+
+def create_fake_gemini_app(
+    latency: float = 0.0,
+    slow_rate: float = 0.0,
+    slow_latency: float = 0.0,
+    error_rate: float = 0.0,
+    rate_limit_rate: float = 0.0,
+    burst_every: float = 0.0,
+    burst_duration: float = 0.0,
+) -> FastAPI:
+    app = FastAPI(title="Fake Gemini")
+    app.state.latency = latency
+    app.state.slow_rate = slow_rate
+    app.state.slow_latency = slow_latency
+    app.state.error_rate = error_rate
+    app.state.rate_limit_rate = rate_limit_rate
+    app.state.burst_every = burst_every
+    app.state.burst_duration = burst_duration
+    app.state.started_at = time.monotonic()
+    app.state.calls = {"ok": 0, "error": 0, "rate_limited": 0}
+
+    def response_latency() -> float:
+        if app.state.slow_rate and random.random() < app.state.slow_rate:
+            return app.state.slow_latency
+        return app.state.latency
+
+    def injected_fault() -> JSONResponse | None:
+        if app.state.burst_every and app.state.burst_duration:
+            if (time.monotonic() - app.state.started_at) % app.state.burst_every < app.state.burst_duration:
+                app.state.calls["rate_limited"] += 1
+                return _error(429, "RESOURCE_EXHAUSTED", "Quota exceeded (burst)")
+        if app.state.rate_limit_rate and random.random() < app.state.rate_limit_rate:
+            app.state.calls["rate_limited"] += 1
+            return _error(429, "RESOURCE_EXHAUSTED", "Quota exceeded")
+        if app.state.error_rate and random.random() < app.state.error_rate:
+            app.state.calls["error"] += 1
+            return _error(503, "UNAVAILABLE", "The model is overloaded")
+        return None
+
+    @app.get("/v1beta/models")
+    async def list_models():
+        return {
+            "models": [
+                {"name": f"models/{name}", "supportedGenerationMethods": ["generateContent"]}
+                for name in FAKE_MODELS
+            ]
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return dict(app.state.calls)
+
+    @app.post("/v1beta/models/{model_action}")
+    async def generate_content(model_action: str, request: Request):
+        await request.body()
+        if not model_action.endswith((":generateContent", ":streamGenerateContent")):
+            return _error(404, "NOT_FOUND", "Not found")
+        fault = injected_fault()
+        if fault is not None:
+            return fault
+
+        app.state.calls["ok"] += 1
+        text = json.dumps(FAKE_PLAN, ensure_ascii=False)
+        if model_action.endswith(":streamGenerateContent"):
+            return StreamingResponse(_stream_chunks(text, response_latency()), media_type="text/event-stream")
+        await asyncio.sleep(response_latency())
+        return _candidate(text)
+
+    return app
+
+
+class FakeGeminiServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **options):
+        if port == 0:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                sock.bind((host, 0))
+                port = sock.getsockname()[1]
+        self.host = host
+        self.port = port
+        self.app = create_fake_gemini_app(**options)
+        self._server = uvicorn.Server(
+            uvicorn.Config(self.app, host=host, port=port, log_level="warning", backlog=4096)
+        )
+        self._thread = threading.Thread(target=self._server.run, name="fake-gemini", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1beta"
+
+    def start(self) -> "FakeGeminiServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def shutdown(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def start_fake_gemini(host: str = "127.0.0.1", port: int = 0, **options) -> FakeGeminiServer:
+    # options: latency, slow_rate, slow_latency, error_rate, rate_limit_rate, burst_every, burst_duration.
+    return FakeGeminiServer(host, port, **options).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per generation call")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of calls that take --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of calls answered with 429")
+    parser.add_argument("--burst-every", type=float, default=0.0, help="seconds between 429 bursts (0 disables)")
+    parser.add_argument("--burst-duration", type=float, default=0.0, help="length of each 429 burst in seconds")
+    args = parser.parse_args()
+    app = create_fake_gemini_app(
+        latency=args.latency,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        burst_every=args.burst_every,
+        burst_duration=args.burst_duration,
+    )
+    print(f"fake Gemini at http://{args.host}:{args.port}/v1beta (call counts at /stats)")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", backlog=4096)
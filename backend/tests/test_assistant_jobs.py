@@ -0,0 +1,75 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import AssistantChat, AssistantJob, AssistantMessage, Car, ServiceOrder, User
+from app.services import assistant_jobs
+from app.services import assistant_service as service
+
+BOOKING = "запиши машину на ТО завтра в 10:00"
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    for model in (User, Car, ServiceOrder, AssistantChat, AssistantMessage, AssistantJob):
+        model.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.execute(insert(User), [{"id": 1, "username": "user", "email": "user@example.com", "password_hash": "x", "role": "user"}])
+    session.execute(insert(Car), [{"id": 1, "brand": "Toyota", "model": "Camry", "year": 2018, "owner_id": 1}])
+    session.commit()
+    yield session
+    session.close()
+
+
+def _run_next_job(db):
+    job = assistant_jobs._claim_next_job(db)
+    assistant_jobs._run_job(db, job)
+    return job
+
+
+def test_retried_booking_job_creates_one_order(db, monkeypatch):
+    user = db.get(User, 1)
+    chat = service.create_chat(db, user)
+    assistant_jobs.enqueue_message(db, user, chat.id, BOOKING)
+
+    commit = db.commit
+
+    def fail_before_reply_commit():
+        # The attempt dies after the booking is written but before the turn commits.
+        if any(isinstance(item, AssistantMessage) and item.role == "assistant" for item in db.new):
+            raise RuntimeError("worker died")
+        commit()
+
+    monkeypatch.setattr(db, "commit", fail_before_reply_commit)
+    job = _run_next_job(db)
+    assert job.status == "queued"
+    assert db.query(ServiceOrder).count() == 0
+
+    monkeypatch.setattr(db, "commit", commit)
+    job = _run_next_job(db)
+    assert job.status == "done"
+    assert db.query(ServiceOrder).count() == 1
+    assert db.query(AssistantMessage).filter(AssistantMessage.role == "assistant").count() == 1
+
+
+def test_retry_adopts_only_its_own_reply(db):
+    user = db.get(User, 1)
+    chat = service.create_chat(db, user)
+    job = assistant_jobs.enqueue_message(db, user, chat.id, "сколько у меня машин")
+    # A synchronous turn in the same chat answers first.
+    service.send_message(db, user, chat.id, "покажи мои заявки")
+
+    _run_next_job(db)
+    reply = job.assistant_message
+    assert reply.reply_to_id == job.user_message_id
+    assert json.loads(job.result_json)["answer"] == reply.content
+
+    # A retry after the reply was committed adopts that reply with its own metadata.
+    stored = service.find_stored_reply(db, job.user_message)
+    assert stored["assistant_message"].id == reply.id
+    assert (stored["provider"], stored["model"]) == ("rules", "rule-based")
+    assert json.loads(job.result_json)["provider"] == "rules"
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api import auth
+from app.core import user_cache
+from app.models import AuthSession, User
+from app.services import auth_sessions
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    User.__table__.create(engine)
+    AuthSession.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.execute(insert(User), [{"id": 1, "username": "user", "email": "user@example.com", "password_hash": "x", "role": "user"}])
+    session.commit()
+    user_cache._users.clear()
+    auth_sessions._families.clear()
+    yield session
+    session.close()
+    user_cache._users.clear()
+    auth_sessions._families.clear()
+
+
+def _login(db) -> str:
+    _, session_id = auth_sessions.create_session(db, 1)
+    return "Bearer " + auth.create_access_token({"user_id": 1, "role": "user", "sid": session_id})
+
+
+def _principal(db, authorization: str) -> auth.Principal:
+    return auth.get_current_principal(access_token=None, authorization=authorization, db=db)
+
+
+def _logout(db, authorization: str) -> None:
+    auth.logout(response=Response(), data=None, refresh_token=None, access_token=None, authorization=authorization, db=db)
+
+
+def test_logged_out_token_is_rejected(db):
+    phone, laptop = _login(db), _login(db)
+    assert _principal(db, phone).id == 1
+
+    _logout(db, phone)
+
+    with pytest.raises(HTTPException) as error:
+        _principal(db, phone)
+    assert (error.value.status_code, error.value.detail) == (401, "Token revoked")
+    with pytest.raises(HTTPException):
+        auth.get_current_user(access_token=None, authorization=phone, db=db)
+    # Other devices keep their sessions.
+    assert _principal(db, laptop).id == 1
+
+
+def test_other_workers_reject_the_token_after_the_check_ttl(db, monkeypatch):
+    phone = _login(db)
+    assert _principal(db, phone).id == 1
+
+    # Logout handled by another worker: only the database knows about it.
+    session_id = auth.decode_access_token(phone.split(" ", 1)[1])["sid"]
+    db.query(AuthSession).filter(AuthSession.family_id == session_id).update({AuthSession.revoked_at: datetime.utcnow()})
+    db.commit()
+    monkeypatch.setattr(auth_sessions, "SESSION_CHECK_TTL_SECONDS", 0)
+
+    with pytest.raises(HTTPException) as error:
+        _principal(db, phone)
+    assert error.value.status_code == 401
+
+
+def test_refreshed_token_of_another_session_still_works(db):
+    refresh_token, _ = auth_sessions.create_session(db, 1)
+    phone = _login(db)
+    _logout(db, phone)
+
+    body = auth.refresh(response=Response(), data=auth.RefreshRequest(refresh_token=refresh_token), refresh_token=None, db=db)
+    assert _principal(db, "Bearer " + body["access_token"]).id == 1
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import Response
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api import auth
+from app.models import AuthSession, User
+from app.services import auth_sessions
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    User.__table__.create(engine)
+    AuthSession.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.execute(insert(User), [{"id": 1, "username": "user", "email": "user@example.com", "password_hash": "x", "role": "user"}])
+    session.commit()
+    auth_sessions._families.clear()
+    yield session
+    session.close()
+    auth_sessions._families.clear()
+
+
+def _session(db, token: str) -> AuthSession:
+    return db.query(AuthSession).filter(AuthSession.token_hash == auth_sessions._token_hash(token)).one()
+
+
+def _age_rotation(db, token: str, seconds: float) -> None:
+    _session(db, token).rotated_at -= timedelta(seconds=seconds)
+    db.commit()
+
+
+def test_rotation_issues_a_new_token_in_the_same_family(db):
+    token, family_id = auth_sessions.create_session(db, 1)
+    user, new_token, rotated_family = auth_sessions.rotate_session(db, token)
+
+    assert user.id == 1
+    assert new_token != token
+    assert rotated_family == family_id
+    assert _session(db, token).rotated_at is not None
+    assert auth_sessions.rotate_session(db, new_token) is not None
+
+
+def test_reuse_within_grace_window_is_rejected_without_revoking(db):
+    token, family_id = auth_sessions.create_session(db, 1)
+    _, new_token, _ = auth_sessions.rotate_session(db, token)
+
+    assert auth_sessions.rotate_session(db, token) is None
+    assert not auth_sessions.session_revoked(db, family_id)
+    assert auth_sessions.rotate_session(db, new_token) is not None
+
+
+def test_reuse_after_grace_window_revokes_the_family(db):
+    token, family_id = auth_sessions.create_session(db, 1)
+    _, new_token, _ = auth_sessions.rotate_session(db, token)
+    _age_rotation(db, token, auth_sessions.REFRESH_REUSE_GRACE_SECONDS + 1)
+
+    assert auth_sessions.rotate_session(db, token) is None
+    assert auth_sessions.session_revoked(db, family_id)
+    assert auth_sessions.rotate_session(db, new_token) is None
+
+
+def test_expired_session_is_rejected(db):
+    token, _ = auth_sessions.create_session(db, 1)
+    _session(db, token).expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    assert auth_sessions.rotate_session(db, token) is None
+
+
+def test_revoke_session_ends_the_whole_family(db):
+    token, family_id = auth_sessions.create_session(db, 1)
+    _, new_token, _ = auth_sessions.rotate_session(db, token)
+    other_token, other_family = auth_sessions.create_session(db, 1)
+
+    auth_sessions.revoke_session(db, token)
+
+    assert auth_sessions.rotate_session(db, new_token) is None
+    assert auth_sessions.session_revoked(db, family_id)
+    assert not auth_sessions.session_revoked(db, other_family)
+    assert auth_sessions.rotate_session(db, other_token) is not None
+
+
+def test_revoke_user_sessions_ends_every_family(db):
+    first, _ = auth_sessions.create_session(db, 1)
+    second, _ = auth_sessions.create_session(db, 1)
+
+    auth_sessions.revoke_user_sessions(db, 1)
+
+    assert auth_sessions.rotate_session(db, first) is None
+    assert auth_sessions.rotate_session(db, second) is None
+
+
+def test_refresh_endpoint_rejects_unknown_token_and_clears_the_cookie(db):
+    rejected = auth.refresh(response=Response(), data=auth.RefreshRequest(refresh_token="unknown"), refresh_token=None, db=db)
+
+    assert rejected.status_code == 401
+    assert "refresh_token=" in rejected.headers["set-cookie"]
+    assert "Path=/auth" in rejected.headers["set-cookie"]
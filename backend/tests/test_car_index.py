@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Car, User
+from app.services import assistant_service as service
+from app.services import car_index
+
+USER = SimpleNamespace(id=1, role="user", username="user")
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    User.__table__.create(engine)
+    Car.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.execute(insert(User), [{"id": 1, "username": "user", "email": "user@example.com", "password_hash": "x", "role": "user"}])
+    session.execute(insert(Car), [{"id": 1, "brand": "Toyota", "model": "Camry", "year": 2018, "owner_id": 1}])
+    session.commit()
+    car_index._indexes.clear()
+    yield session
+    session.close()
+    car_index._indexes.clear()
+
+
+def _add_car_elsewhere(db):
+    # Another worker adds a car: this worker's index keeps its version.
+    db.execute(insert(Car), [{"id": 2, "brand": "BMW", "model": "X5", "year": 2020, "owner_id": 1}])
+    db.commit()
+
+
+def test_single_car_fallback_uses_current_cars(db):
+    assert service._match_scoped_car_from_text(db, USER, "какой пробег").id == 1
+    _add_car_elsewhere(db)
+    assert service._match_scoped_car_from_text(db, USER, "какой пробег") is None
+    assert service._match_user_car_from_text(db, USER, "запиши на ТО") is None
+
+
+def test_booking_asks_which_car_after_a_car_is_added(db):
+    assert service._match_user_car_from_text(db, USER, "запиши на ТО").id == 1
+    _add_car_elsewhere(db)
+    reply, result = service._create_booking(db, USER, {"scheduled_at": "2026-11-02 10:00"})
+    assert result is None
+    assert reply.startswith("Уточните, на какую машину")
+
+
+def test_name_match_still_uses_the_index(db):
+    _add_car_elsewhere(db)
+    car_index._indexes.clear()
+    assert service._match_scoped_car_from_text(db, USER, "пробег bmw").id == 2
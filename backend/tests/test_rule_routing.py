@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import assistant_service as service
+
+USER = SimpleNamespace(id=1, role="user", username="user")
+
+
+def _plan(message: str):
+    return service._rule_based_plan(None, USER, message)
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "сколько я заплатил по счетам",
+        "Сколько стоит ТО для моей машины?",
+        "сколько стоит замена масла на машине",
+        "сколько заявок",
+    ],
+)
+def test_money_and_ambiguous_counts_are_left_to_the_model(message):
+    assert not service._is_confident_rule_plan(_plan(message))
+
+
+@pytest.mark.parametrize("message", ["сколько заявок", "Сколько у меня машин?", "сколько стоит замена масла на машине"])
+def test_count_word_is_not_a_damage_report(message):
+    assert "damage_reports" not in service._detect_requested_entities(message)
+
+
+def test_real_chips_still_count_as_damage_reports():
+    assert service._detect_requested_entities("сколько сколов на капоте") == ["damage_reports"]
+
+
+def test_counts_of_several_entities_are_not_confident():
+    plan = _plan("сколько у меня машин и счетов")
+    assert plan["data"]["entities"] == ["cars", "invoices"]
+    assert not service._is_confident_rule_plan(plan)
+
+
+def test_plain_count_stays_on_rules():
+    plan = _plan("Сколько у меня машин?")
+    assert plan["data"]["entities"] == ["cars"]
+    assert service._is_confident_rule_plan(plan)
@@ -0,0 +1,32 @@
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.db.sql_logging import SqlRouteMiddleware, current_route
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(SqlRouteMiddleware)
+
+    @app.get("/sync/{item_id}")
+    def sync_route(item_id: int):
+        return {"route": current_route.get()}
+
+    @app.get("/stream")
+    async def stream_route():
+        async def chunks():
+            yield f"{current_route.get()}\n"
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    return TestClient(app)
+
+
+def test_route_is_tagged_for_threadpool_handlers():
+    assert _client().get("/sync/7").json() == {"route": "GET /sync/7"}
+    assert current_route.get() is None
+
+
+def test_route_is_tagged_while_streaming():
+    assert _client().get("/stream").text == "GET /stream\n"
@@ -22,7 +22,10 @@ export type Chat = {
   createdAt: string;
   updatedAt: string;
   messagesCount: number;
+  lastMessageAt: string | null;
+  lastMessagePreview: string | null;
   messages: Message[];
+  hasMoreMessages: boolean;
 };
 
 export const useAssistant = () => {
@@ -31,6 +34,7 @@ export const useAssistant = () => {
   const { t, locale } = useI18n();
   const chats = useState<Chat[]>("assistant-chats", () => []);
   const activeChat = useState<Chat | null>("assistant-active-chat", () => null);
+  const chatsCursor = useState<string | null>("assistant-chats-cursor", () => null);
 
   const api = () => `${config.public.apiBase}/assistant`;
 
@@ -65,7 +69,10 @@ export const useAssistant = () => {
     createdAt: chat.created_at || chat.createdAt,
     updatedAt: chat.updated_at || chat.updatedAt,
     messagesCount: chat.messages_count ?? chat.messagesCount ?? (chat.messages?.length || 0),
+    lastMessageAt: chat.last_message_at ?? chat.lastMessageAt ?? null,
+    lastMessagePreview: chat.last_message_preview ?? chat.lastMessagePreview ?? null,
     messages: Array.isArray(chat.messages) ? chat.messages.map(normalizeMessage) : [],
+    hasMoreMessages: Boolean(chat.has_more_messages ?? chat.hasMoreMessages),
   });
 
   const sortedChats = computed(() => {
@@ -90,7 +97,7 @@ export const useAssistant = () => {
 
   const appendLocalMessage = (chatId: string, role: MessageRole, content: string) => {
     const chat = chats.value.find((item) => item.id === chatId) || activeChat.value;
-    if (!chat || chat.id !== chatId) return;
+    if (!chat || chat.id !== chatId) return null;
 
     const message: Message = {
       id: crypto.randomUUID(),
@@ -106,12 +113,36 @@ export const useAssistant = () => {
     if (chat.messages.length === 1 && role === "user") {
       chat.title = content.trim().slice(0, 40) || t("new_chat");
     }
+    return message.id;
+  };
+
+  // Delta responses carry only the two new messages; swap the optimistic user
+  // message for the stored one and append the reply.
+  const applyMessageDelta = (chatId: string, localMessageId: string | null, response: any) => {
+    const chat = getChatById(chatId);
+    if (!chat) return null;
+
+    const added = [normalizeMessage(response.user_message), normalizeMessage(response.assistant_message)];
+    chat.messages = [...chat.messages.filter((message) => message.id !== localMessageId), ...added];
+    chat.title = response.chat.title || chat.title;
+    chat.provider = response.chat.provider || chat.provider;
+    chat.updatedAt = response.chat.updated_at || chat.updatedAt;
+    chat.messagesCount = response.chat.messages_count ?? chat.messages.length;
+    chat.lastMessageAt = response.chat.last_message_at ?? chat.lastMessageAt;
+    chat.lastMessagePreview = response.chat.last_message_preview ?? chat.lastMessagePreview;
+
+    if (activeChat.value?.id === chat.id && activeChat.value !== chat) {
+      activeChat.value = chat;
+    }
+    return chat;
   };
 
   const fetchChats = async () => {
-    const result = await $fetch<any[]>(`${api()}/chats`, {
+    const response = await $fetch.raw<any[]>(`${api()}/chats`, {
       headers: authHeaders.value,
     });
+    const result = response._data || [];
+    chatsCursor.value = response.headers.get("x-next-cursor");
     const previousById = new Map(chats.value.map((chat) => [chat.id, chat]));
 
     chats.value = result.map((rawChat) => {
@@ -142,6 +173,23 @@ export const useAssistant = () => {
     return chats.value;
   };
 
+  // Older chats are paged with the keyset cursor from the previous response.
+  const fetchMoreChats = async () => {
+    if (!chatsCursor.value) return chats.value;
+
+    const response = await $fetch.raw<any[]>(`${api()}/chats`, {
+      headers: authHeaders.value,
+      query: { cursor: chatsCursor.value },
+    });
+    const known = new Set(chats.value.map((chat) => chat.id));
+    const older = (response._data || []).map(normalizeChat).filter((chat) => !known.has(chat.id));
+    chats.value = [...chats.value, ...older];
+    chatsCursor.value = response.headers.get("x-next-cursor");
+    return chats.value;
+  };
+
+  const hasMoreChats = computed(() => Boolean(chatsCursor.value));
+
   const renameChat = async (id: string, title: string) => {
     const result = await $fetch<any>(`${api()}/chats/${id}`, {
       method: "PATCH",
@@ -181,6 +229,19 @@ export const useAssistant = () => {
     return upsertChat(result);
   };
 
+  const loadOlderMessages = async (id: string) => {
+    const chat = getChatById(id);
+    if (!chat || !chat.hasMoreMessages || !chat.messages.length) return chat;
+
+    const result = await $fetch<any>(`${api()}/chats/${id}/messages`, {
+      headers: authHeaders.value,
+      query: { before: chat.messages[0].id },
+    });
+    chat.messages = [...result.messages.map(normalizeMessage), ...chat.messages];
+    chat.hasMoreMessages = Boolean(result.has_more);
+    return chat;
+  };
+
   const getChatById = (id: string) => {
     return chats.value.find((chat) => chat.id === id) ?? (activeChat.value?.id === id ? activeChat.value : undefined);
   };
@@ -204,16 +265,17 @@ export const useAssistant = () => {
     const text = content.trim();
     if (!text) return;
 
-    appendLocalMessage(chatId, "user", text);
+    const localMessageId = appendLocalMessage(chatId, "user", text);
 
     try {
       const response = await $fetch<any>(`${api()}/chats/${chatId}/messages`, {
         method: "POST",
         headers: authHeaders.value,
+        query: { delta: true },
         body: { message: text },
       });
 
-      const normalized = upsertChat(response.chat);
+      const normalized = applyMessageDelta(chatId, localMessageId, response) || (await loadChat(chatId));
       activeChat.value = normalized;
       return {
         chat: normalized,
@@ -255,10 +317,13 @@ export const useAssistant = () => {
     sortedChats,
     activeChat,
     fetchChats,
+    fetchMoreChats,
+    hasMoreChats,
     createChat,
     renameChat,
     deleteChat,
     loadChat,
+    loadOlderMessages,
     getChatById,
     sendMessage,
     ensureChat,
@@ -0,0 +1,33 @@
+import { useAuthStore } from '~/stores/auth'
+
+// Access token живет 30 минут: на 401 один раз продлеваем сессию refresh-токеном
+// и повторяем запрос с новым Bearer, вместо повторного входа по паролю.
+export default defineNuxtPlugin(() => {
+  const auth = useAuthStore()
+  const baseFetch = globalThis.$fetch
+
+  const withRefresh = <T extends (request: any, options?: any) => Promise<any>>(call: T) =>
+    (async (request: any, options: any = {}) => {
+      try {
+        return await call(request, options)
+      } catch (e: any) {
+        const status = e?.status || e?.response?.status
+        const headers = new Headers(options.headers as HeadersInit | undefined)
+        const url = typeof request === 'string' ? request : String(request?.url || '')
+
+        if (status !== 401 || !headers.get('Authorization')?.startsWith('Bearer ') || url.includes('/auth/')) {
+          throw e
+        }
+        if (!(await auth.refresh())) throw e
+
+        headers.set('Authorization', `Bearer ${auth.token}`)
+        return await call(request, { ...options, headers })
+      }
+    }) as unknown as T
+
+  const wrapped = withRefresh(baseFetch) as typeof $fetch
+  wrapped.raw = withRefresh(baseFetch.raw)
+  wrapped.native = baseFetch.native
+  wrapped.create = baseFetch.create
+  globalThis.$fetch = wrapped
+})
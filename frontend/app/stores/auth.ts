@@ -1,5 +1,8 @@
 import { defineStore } from 'pinia'
 
+// один refresh на вкладку: параллельные 401 ждут его, а не ротируют токен повторно
+let refreshing: Promise<boolean> | null = null
+
 type User = {
   id: number
   username: string
@@ -51,11 +54,56 @@ export const useAuthStore = defineStore('auth', {
         // если сервер недоступен — не выходим, просто считаем что оффлайн
         if (e?.message?.includes('Сервер недоступен')) return
 
+        // access token истек — продлеваем сессию refresh-токеном, без пароля
+        if (await this.refresh()) {
+          try {
+            await this.fetchMe()
+            return
+          } catch {}
+        }
+
         // если токен умер/401 — выходим
         this.logout()
       }
     },
 
+    refresh() {
+      if (!refreshing) {
+        refreshing = this.rotateRefreshToken().finally(() => {
+          refreshing = null
+        })
+      }
+      return refreshing
+    },
+
+    async rotateRefreshToken() {
+      const config = useRuntimeConfig()
+      const refreshToken = import.meta.client ? localStorage.getItem('refresh_token') : null
+
+      if (!refreshToken) return false
+
+      try {
+        const data = await $fetch<{ access_token: string; refresh_token: string }>(
+          `${config.public.apiBase}/auth/refresh`,
+          { method: 'POST', body: { refresh_token: refreshToken } }
+        )
+
+        this.token = data.access_token
+        localStorage.setItem('access_token', data.access_token)
+        localStorage.setItem('refresh_token', data.refresh_token)
+        return true
+      } catch {
+        // другая вкладка уже ротировала токен — берем ее access token
+        const storedAccess = localStorage.getItem('access_token')
+        if (localStorage.getItem('refresh_token') !== refreshToken && storedAccess) {
+          this.token = storedAccess
+          return true
+        }
+        localStorage.removeItem('refresh_token')
+        return false
+      }
+    },
+
     async fetchMe() {
       const config = useRuntimeConfig()
 
@@ -98,7 +146,7 @@ export const useAuthStore = defineStore('auth', {
       const form = new URLSearchParams({ username, password })
 
       try {
-        const data = await $fetch<{ access_token: string }>(
+        const data = await $fetch<{ access_token: string; refresh_token: string }>(
           `${config.public.apiBase}/auth/login`,
           { method: 'POST', body: form }
         )
@@ -108,6 +156,7 @@ export const useAuthStore = defineStore('auth', {
 
         if (import.meta.client) {
           localStorage.setItem('access_token', data.access_token)
+          localStorage.setItem('refresh_token', data.refresh_token)
         }
 
         await this.fetchMe()
@@ -125,6 +174,17 @@ export const useAuthStore = defineStore('auth', {
     },
 
     logout() {
+      const refreshToken = import.meta.client ? localStorage.getItem('refresh_token') : null
+      if (this.token || refreshToken) {
+        // отзываем токены на бэке; выход локально не ждет ответа
+        const config = useRuntimeConfig()
+        $fetch(`${config.public.apiBase}/auth/logout`, {
+          method: 'POST',
+          headers: this.token ? { Authorization: `Bearer ${this.token}` } : undefined,
+          body: refreshToken ? { refresh_token: refreshToken } : undefined
+        }).catch(() => {})
+      }
+
       this.user = null
       this.isAuth = false
       this.token = null
@@ -132,6 +192,7 @@ export const useAuthStore = defineStore('auth', {
 
       if (import.meta.client) {
         localStorage.removeItem('access_token')
+        localStorage.removeItem('refresh_token')
         localStorage.removeItem('user')
       }
     }